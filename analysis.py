@@ -1,10 +1,21 @@
 import os
+import sys
 import json
+import gzip
+import math
+import time
+import calendar
+from array import array
 from datetime import datetime, timedelta
-from collections import Counter
+from bisect import bisect_left, bisect_right
+from itertools import product
+from collections import Counter, defaultdict
 
+from profiling import Instrument
 
-FOLDER_PATH = "data"
+
+FOLDER_PATH    = os.getenv("DATA_FOLDER", "data") # the folder of the metric files, e.g. a synthetic fleet from synthetic.py
+COLLECTOR_PATH = os.getenv("DATA_COLLECTOR", "")  # a collector store (collector.py) to read instead, if set
 
 TIMESTAMP_START       = datetime.strptime('2025-09-22 00:00:00', '%Y-%m-%d %H:%M:%S')
 TIMESTAMP_2HOUR       = datetime.strptime('2025-09-22 02:00:00', '%Y-%m-%d %H:%M:%S')
@@ -16,8 +27,306 @@ TIME_INTERVAL_10MIN   = timedelta(minutes=10)
 TIME_INTERVAL_1HOUR   = timedelta(minutes=60)
 TIME_INTERVAL_1DAY    = timedelta(minutes=1440)
 
+# The base history columns; the agent may append optional columns after these, e.g. per-interval sample aggregates
+HISTORY_COLUMN = ('no, timestamp, gpu_vram_used_percent_%, gpu_vram_utilization_%, gpu_utilization_%, gpu_temperature_C, cpu_percent_%, cpu_ram_used_%'
+                  ', performance_sol_s, power_watts, core_temp_C, core_clock_MHz, accepted, rejected')
+
+# The startup phases recorded by the agent, in the order they are normally reached
+# network_test_done runs in the background, in parallel with the other phases
+STARTUP_PHASES = [ 'agent_start', 'first_metric', 'miner_spawn', 'first_hash', 'first_share' ]
+
+# The partitions of the grouped uptime engine; any of them can be "all" in a group key
+UPTIME_PARTITIONS = ( 'state', 'gpu_class', 'gpu_type', 'country' )
+UPTIME_QUANTILES  = ( 0.1, 0.25, 0.5, 0.75, 0.9 )
+
+# How the history of a node run is loaded by Get_DataList:
+#   "rows"    - a list of row strings, as in the metric file
+#   "columns" - typed column buffers (History_Columns), streamed from the file without keeping the row strings
+#   "none"    - skip the history, for run metadata only (node_run has no 'history')
+DATA_HISTORY = os.getenv("DATA_HISTORY", "rows")
+READ_CHUNK   = 1 << 20  # characters read per chunk by the streaming reader
+
+# The timestamps are '%Y-%m-%d %H:%M:%S' strings in naive UTC. The loader adds online_epoch and last_update_epoch
+# (integer epoch seconds) to every node run, so the time math is done on integers
+EPOCH      = datetime(1970, 1, 1)
+EPOCH_DAYS = {}  # epoch seconds of each date parsed, memoized: the rows and node runs of a test share a few dates
+
+
+# Fast path for a timestamp string, e.g. "2025-09-22 00:02:05" -> 1758499325
+def Parse_Epoch(timestamp):
+    day = EPOCH_DAYS.get(timestamp[:10])
+    if day is None:
+        day = EPOCH_DAYS[timestamp[:10]] = calendar.timegm((int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]), 0, 0, 0))
+    return day + int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19])
+
+
+def Datetime_Epoch(dt):
+    return calendar.timegm(dt.timetuple())
+
+
+def Epoch_Datetime(epoch):
+    return EPOCH + timedelta(seconds=epoch)
+
+
+# Agents before the epoch fields only report the timestamp strings
+def Set_Epoch_Fields(node_run):
+    if 'online_epoch' not in node_run:
+        node_run['online_epoch'] = Parse_Epoch(node_run['online'])
+    if 'last_update_epoch' not in node_run:
+        node_run['last_update_epoch'] = Parse_Epoch(node_run['last_update'])
+
+
+# The fields of the agent report, kept in the slots of a NodeRun; any other field goes to a per-run dict
+# Slot names replace the % of a field name, e.g. cpu_ram_used_% -> node_run.cpu_ram_used_pct
+NODE_RUN_FIELDS = ( 'online', 'last_update', 'online_epoch', 'last_update_epoch', 'uptime_s', 'no', 'metric_interval_s', 'report_number',
+                    'sample_interval_s', 'miner_algorithm', 'miner_state', 'salad_machine_id', 'pass', 'gpu_cuda_version', 'gpu_type',
+                    'gpu_number', 'gpu_vram_total_MiB', 'gpu_vram_used_MiB', 'gpu_vram_used_percent_%', 'gpu_utilization_%',
+                    'gpu_temperature_C', 'gpu_vram_utilization_%', 'cpu_type', 'cpu_num_vcpus', 'cpu_freq_MHz', 'cpu_percent_%',
+                    'cpu_ram_total_B', 'cpu_ram_used_B', 'cpu_ram_used_%', 'country', 'location', 'rtt_ms', 'upload_Mbps', 'download_Mbps',
+                    'rtt_to_us_west1_ms', 'rtt_to_us_east2_ms', 'rtt_to_eu_cent1_ms', 'network_pass', 'network_cached',
+                    'network_measured_epoch', 'history_column', 'history', 'history_retention', 'miner_restarts', 'miner_downtime_s',
+                    'miner_last_exit_code', 'miner_events', 'miners', 'startup_phases_s', 'covered_s', 'uncovered' )
+NODE_RUN_SLOTS = { field: field.replace('%', 'pct') for field in NODE_RUN_FIELDS }
+# Categorical fields, shared by many node runs: one interned string per value
+NODE_RUN_CATEGORIES = frozenset(( 'miner_algorithm', 'miner_state', 'salad_machine_id', 'gpu_type', 'cpu_type', 'country', 'location',
+                                  'history_column', 'history_retention' ))
+# Numbers reported as strings: parsed once, and written back as strings by NodeRun.to_dict
+NODE_RUN_NUMBERS = frozenset(( 'rtt_ms', 'upload_Mbps', 'download_Mbps', 'rtt_to_us_west1_ms', 'rtt_to_us_east2_ms', 'rtt_to_eu_cent1_ms' ))
+NODE_RUN_SCHEMAS = {}  # the field order of the node runs, one shared tuple per distinct order
+
+
+# A number from a string, if it is written back the same; "pending", "none", ... stay as (interned) strings
+def Parse_Number(x):
+    if not isinstance(x, str):
+        return x
+    try:
+        number = int(x)
+    except ValueError:
+        try:
+            number = float(x)
+        except ValueError:
+            return sys.intern(x)
+    return number if str(number) == x else x
+
+
+# A loaded node run: the report fields in slots instead of a dict per run, with the categorical strings interned and
+# the numeric strings parsed. It reads like the report dict, node_run['gpu_type'], node_run.get('country', "none"),
+# 'history_column' in node_run, and the report fields are also attributes, node_run.online_epoch
+# The field order of the report (keys()) is a shared tuple, and to_dict() rebuilds the report on demand
+class NodeRun:
+    __slots__ = tuple(NODE_RUN_SLOTS.values()) + ( '_schema', '_extra' )
+
+    def __init__(self, fields):
+        self._schema = NODE_RUN_SCHEMAS.setdefault(tuple(fields), tuple(fields))
+        self._extra = None
+        for key, value in fields.items():
+            self.set(key, value)
+
+    def set(self, key, value):
+        slot = NODE_RUN_SLOTS.get(key)
+        if slot is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+            return
+        if key in NODE_RUN_CATEGORIES and isinstance(value, str):
+            value = sys.intern(value)
+        elif key in NODE_RUN_NUMBERS:
+            value = Parse_Number(value)
+        setattr(self, slot, value)
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            schema = self._schema + (key,)
+            self._schema = NODE_RUN_SCHEMAS.setdefault(schema, schema)
+        self.set(key, value)
+
+    def __getitem__(self, key):
+        slot = NODE_RUN_SLOTS.get(key)
+        try:
+            return getattr(self, slot) if slot is not None else self._extra[key]
+        except (AttributeError, TypeError):  # an unset slot, or no other fields
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        slot = NODE_RUN_SLOTS.get(key)
+        if slot is not None:
+            return hasattr(self, slot)
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self._schema
+
+    def items(self):
+        return [ (key, self[key]) for key in self._schema ]
+
+    def __len__(self):
+        return len(self._schema)
+
+    # The report as read, e.g. to write it back with json.dump
+    def to_dict(self):
+        return { key: str(value) if key in NODE_RUN_NUMBERS else value for key, value in self.items() }
+
+    def __repr__(self):
+        return f"NodeRun({self.get('online')}, {self.get('salad_machine_id')})"
+
+
+# Incremental JSON reading: the file is read in chunks and values are decoded one at a time from the buffer,
+# so a node run never needs the whole file text in memory
+class Json_Stream:
+    decoder = json.JSONDecoder()
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    # Read the next chunk, dropping the text already decoded
+    def fill(self):
+        chunk = self.f.read(READ_CHUNK)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+        return not self.eof
+
+    # The next non-whitespace character, "" at the end of the file
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, c):
+        if self.peek() != c:
+            raise json.JSONDecodeError(f"Expecting '{c}'", self.buffer, self.pos)
+        self.pos += 1
+
+    # Skip a comma, if there is one; returns False at the closing bracket
+    def next(self, close):
+        if self.peek() == ',':
+            self.pos += 1
+        return self.peek() != close
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut at the chunk end may still decode, e.g. "49800." from "49800.056",
+                # so only take a value that is followed by a separator
+                k = end
+                while k < len(self.buffer) and self.buffer[k] in ' \t\r\n':
+                    k += 1
+                if self.eof or k < len(self.buffer) and self.buffer[k] in ',:]}':
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def Get_Float(x):
+    try:
+        return float(x)
+    except ValueError:
+        return float('nan')
+
+
+# Typed column buffers for the history of a node run: 'no' and the timestamps (epoch seconds) are integers,
+# everything else is a double. Indexing and iterating give back the row strings, so it can stand in for the list
+INTEGER_COLUMNS = ( 'no', 'timestamp', 'timestamp_epoch' )
+
+
+class History_Columns:
+    def __init__(self, history_column):
+        self.columns = [ column.strip() for column in history_column.split(',') ]
+        self.store = [ array('q') if column in INTEGER_COLUMNS else array('d') for column in self.columns ]
+        self.parse = [ Parse_Epoch if column == 'timestamp' else int if column in INTEGER_COLUMNS else Get_Float for column in self.columns ]
+
+    def append(self, value):
+        fields = value.split(',')
+        if len(fields) < len(self.columns):
+            fields += [""] * (len(self.columns) - len(fields))
+        for store, parse, x in zip(self.store, self.parse, fields):
+            store.append(parse(x))
+
+    def column(self, name):
+        return self.store[self.columns.index(name)]
+
+    def row(self, j):
+        fields = []
+        for column, store in zip(self.columns, self.store):
+            x = store[j]
+            if column == 'timestamp':
+                fields.append(time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(x)))
+            elif column in INTEGER_COLUMNS or x.is_integer():
+                fields.append(str(int(x)))
+            else:
+                fields.append(repr(x))
+        return ",".join(fields)
+
+    def __len__(self):
+        return len(self.store[0])
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return [ self.row(k) for k in range(*j.indices(len(self))) ]
+        return self.row(range(len(self))[j])
+
+    def __iter__(self):
+        return (self.row(j) for j in range(len(self)))
+
+
+# Read one metric file with the streaming reader; history is "rows", "columns" or "none" (see DATA_HISTORY)
+def Read_NodeRun(file_path, history=DATA_HISTORY):
+    node_run = {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        stream = Json_Stream(f)
+        stream.expect('{')
+        while stream.next('}'):
+            key = stream.value()
+            stream.expect(':')
+            if key != 'history':
+                node_run[key] = stream.value()
+                continue
 
-def Get_DataList(folder_path):
+            # Stream the history rows one at a time
+            rows = []
+            if history == "columns" and 'history_column' in node_run:
+                rows = History_Columns(node_run['history_column'])
+            stream.expect('[')
+            while stream.next(']'):
+                value = stream.value()
+                if history != "none":
+                    rows.append(value)
+            stream.expect(']')
+            if history != "none":
+                node_run['history'] = rows
+        stream.expect('}')
+
+    # history_column came after the history, convert the rows now
+    if history == "columns" and isinstance(node_run.get('history'), list):
+        rows = History_Columns(node_run.get('history_column', HISTORY_COLUMN))
+        for value in node_run['history']:
+            rows.append(value)
+        node_run['history'] = rows
+
+    Set_Epoch_Fields(node_run)
+    return NodeRun(node_run)
+
+
+def Get_DataList(folder_path, history=DATA_HISTORY):
     data_list = []
 
     # List all files (excluding directories)
@@ -27,21 +336,94 @@ def Get_DataList(folder_path):
     for filename in os.listdir(folder_path):
         if filename.endswith(".txt"):  # process .txt files
             file_path = os.path.join(folder_path, filename)
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()          # read the file as a string
-                data = json.loads(content)  # parse JSON from string
-                data_list.append(data)
+            data_list.append(Read_NodeRun(file_path, history))
     data_list.sort(key=lambda x: x['online'])
     print(f"----> Number of Node Runs: {len(data_list)}")
 
     return data_list
 
 
+# Read a collector store (collector.py): the open partitions (.jsonl) and the compacted segments (.jsonl.gz) are merged
+# per node run, in time order. The header is the latest one pushed, and the history runs to the latest row pushed,
+# so the header fields that move every row (no, last_update, uptime_s) are brought up to the last row
+def Get_Collector_DataList(store_path, history=DATA_HISTORY):
+    runs = {}
+
+    partitions = sorted(os.path.join(root, filename) for root, _, files in os.walk(store_path)
+                        for filename in files if filename.endswith(".jsonl") or filename.endswith(".jsonl.gz"))
+    print(f"----> Number of partitions in the collector store: {len(partitions)}")
+
+    for path in partitions:
+        with (gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, "r", encoding="utf-8")) as f:
+            for line in f:
+                record = json.loads(line)
+                run = runs.setdefault(record['run'], { 'header': None, 'rows': {}, 'last': None })
+                if record.get('header'):
+                    run['header'] = record['header']
+                for row in record.get('rows', []):
+                    no = int(row.split(",", 1)[0])
+                    if history != "none":
+                        run['rows'].setdefault(no, row)  # rows are resent after a failed push
+                    if run['last'] is None or no > run['last'][0]:
+                        run['last'] = (no, row)
+
+    data_list = []
+    for run in runs.values():
+        if run['header'] is None or run['last'] is None:  # no report header or no row yet
+            continue
+        node_run = dict(run['header'])
+        node_run.pop('history', None)
+        Set_Epoch_Fields(node_run)
+
+        fields = run['last'][1].split(",")
+        last_update_epoch = Parse_Epoch(fields[1])
+        node_run['uptime_s']          = round(node_run['uptime_s'] + last_update_epoch - node_run['last_update_epoch'], 3)
+        node_run['no']                = run['last'][0]
+        node_run['last_update']       = fields[1]
+        node_run['last_update_epoch'] = last_update_epoch
+
+        if history != "none":
+            rows = History_Columns(node_run.get('history_column', HISTORY_COLUMN)) if history == "columns" else []
+            for no in sorted(run['rows']):
+                rows.append(run['rows'][no])
+            node_run['history'] = rows
+        data_list.append(NodeRun(node_run))
+
+    data_list.sort(key=lambda x: x['online'])
+    print(f"----> Number of Node Runs: {len(data_list)} (of {len(runs)} pushing)")
+
+    return data_list
+
+
+# Get the position of a named column in the history rows of a node run
+def Get_Column_Index(node_run, name):
+    columns = [ column.strip() for column in node_run.get('history_column', HISTORY_COLUMN).split(',') ]
+    return columns.index(name)
+
+
+# The values of named history columns of a node run, one list per name:
+# 'no' and the timestamp (epoch seconds) as integers, the rest as floats
+def Get_History_Columns(node_run, names):
+    if isinstance(node_run['history'], History_Columns):
+        return [ node_run['history'].column(name) for name in names ]
+    if 'timestamp_epoch' in node_run.get('history_column', HISTORY_COLUMN):  # read the timestamps as they are
+        names = [ 'timestamp_epoch' if name == 'timestamp' else name for name in names ]
+    index = [ Get_Column_Index(node_run, name) for name in names ]
+    parse = [ Parse_Epoch if name == 'timestamp' else int if name in INTEGER_COLUMNS else float for name in names ]
+    columns = [ [] for _ in names ]
+    maxsplit = max(index) + 1  # the fields after the last named column are not split
+    for entry in node_run['history']:
+        fields = entry.split(",", maxsplit)
+        for i, f, column in zip(index, parse, columns):
+            column.append(f(fields[i]))
+    return columns
+
+
 def Get_TimestampRange(data_list):
     if not data_list:
         return None, None
-    start = min(datetime.strptime(item['online'], '%Y-%m-%d %H:%M:%S') for item in data_list)
-    end = max(datetime.strptime(item['last_update'], '%Y-%m-%d %H:%M:%S') for item in data_list)
+    start = Epoch_Datetime(min(item.online_epoch for item in data_list))
+    end = Epoch_Datetime(max(item.last_update_epoch for item in data_list))
     return start, end
 
 
@@ -50,6 +432,9 @@ def Get_AbnormalNodeRuns(data_list):
 
     # Inconsistent Data
     for node_run in data_list:
+        if not node_run.get('history'):  # not loaded (DATA_HISTORY=none)
+            continue
+        accepted = Get_Column_Index(node_run, 'accepted')
 
         value11 = node_run['no']
         value12 = int(node_run['history'][-1].split(",")[0])
@@ -65,34 +450,39 @@ def Get_AbnormalNodeRuns(data_list):
             continue
 
         # No mining activity
-        temp = int(node_run['history'][-1].split(",")[-2])
+        temp = int(node_run['history'][-1].split(",")[accepted])
         if temp == 0:
             abnormal_node_runs.append( ('No Mining Activity', node_run['online'] ))
             continue
 
         # Mining stopped for 10 minutes
-        temp = int(node_run['history'][-1].split(",")[-2])
+        temp = int(node_run['history'][-1].split(",")[accepted])
         if len(node_run['history']) >10:
-            temp10 = int(node_run['history'][-10].split(",")[-2])
+            temp10 = int(node_run['history'][-10].split(",")[accepted])
             if temp == temp10:
                 abnormal_node_runs.append( ('Mining Stopped', node_run['online'] ))
 
     return abnormal_node_runs
 
 
-def Get_ActiveInstanceNumber(data_list, start, end, interval):
+# covered: count only the minutes covered by history rows, less the stalls found by gaps.Set_Coverage
+def Get_ActiveInstanceNumber(data_list, start, end, interval, covered=False):
     active_instance_number = []
     current_time = start
+    onlines = sorted(node_run.online_epoch for node_run in data_list)
+    updates = sorted(node_run.last_update_epoch for node_run in data_list)
+    spans = [ span for node_run in data_list for span in node_run.get('uncovered', ()) ] if covered else []
+    span_starts = sorted(s for s, _ in spans)
+    span_ends = sorted(e for _, e in spans)
 
     while True:
         if current_time >= end:
             break
-        count = 0
-        for node_run in data_list:
-            nStart = datetime.strptime(node_run['online'], '%Y-%m-%d %H:%M:%S')
-            nEnd = datetime.strptime(node_run['last_update'], '%Y-%m-%d %H:%M:%S')
-            if nStart <= current_time <= nEnd:
-                count += 1
+        # online <= t <= last_update: the node runs online by t, less the ones that stopped before t
+        t = Datetime_Epoch(current_time)
+        count = bisect_right(onlines, t) - bisect_left(updates, t)
+        if spans:  # less the node runs stalled at t, start < t < end
+            count -= bisect_left(span_starts, t) - bisect_right(span_ends, t)
         active_instance_number.append( (current_time.strftime('%Y-%m-%d %H:%M:%S'), count) )
         #if count > 100:
         #    print (f"Warning: More than 100 active instances at {current_time.strftime('%Y-%m-%d %H:%M:%S')}: {count}")
@@ -118,15 +508,15 @@ def Get_ActiveInstanceNumber(data_list, start, end, interval):
 def Get_Allocation(data_list, start, end, interval):
     node_allocation = []
     current_time = start
+    onlines = sorted(node_run.online_epoch for node_run in data_list)
+    step = int(interval.total_seconds())
     
     while True:
         if current_time >= end:
             break
-        count = 0
-        for node_run in data_list:
-            nStart = datetime.strptime(node_run['online'], '%Y-%m-%d %H:%M:%S')
-            if current_time <= nStart < current_time + interval:
-                count += 1
+        # t <= online < t + interval
+        t = Datetime_Epoch(current_time)
+        count = bisect_left(onlines, t + step) - bisect_left(onlines, t)
         node_allocation.append( (current_time.strftime('%Y-%m-%d %H:%M:%S'), count) )
         current_time += interval
 
@@ -148,33 +538,37 @@ def Get_Allocation(data_list, start, end, interval):
 
 # For a node, we cannot determine its real uptime until it has stopped.
 # if last_update is a few minutes earlier than end, it means the node_run has stopped.
-def Get_Uptimes(data_list, start, end, mode, gpu):
+# covered: the uptime covered by history rows, less the stalls found by gaps.Set_Coverage
+def Get_Uptimes(data_list, start, end, mode, gpu, covered=False):
     node_uptimes = []
+    stopped_before = Datetime_Epoch(end - TIME_INTERVAL_10MIN)
+    start, end = Datetime_Epoch(start), Datetime_Epoch(end)
 
     for node_run in data_list:
-        online     = datetime.strptime(node_run['online'], '%Y-%m-%d %H:%M:%S')
-        last_update = datetime.strptime(node_run['last_update'], '%Y-%m-%d %H:%M:%S')
+        online      = node_run.online_epoch
+        last_update = node_run.last_update_epoch
 
         if online < start or online >= end:
             continue
 
         if gpu == "high":
-            if node_run["gpu_vram_total_MiB"] < 20000:
+            if node_run.gpu_vram_total_MiB < 20000:
                 continue
         elif gpu == "low":
-            if node_run["gpu_vram_total_MiB"] >= 10000:
+            if node_run.gpu_vram_total_MiB >= 10000:
                 continue
         else: # "all":
             pass
 
+        uptime = node_run.get('covered_s', node_run.uptime_s) if covered else node_run.uptime_s
         if mode == "stopped":
-            if last_update < end - TIME_INTERVAL_10MIN:
-                node_uptimes.append( (node_run['uptime_s'], node_run['online'], node_run['last_update']) ) 
+            if last_update < stopped_before:
+                node_uptimes.append( (uptime, node_run.online, node_run.last_update) ) 
         elif mode == "running":
-            if end - TIME_INTERVAL_10MIN <= last_update:  
-                node_uptimes.append( (node_run['uptime_s'], node_run['online'], node_run['last_update']) ) 
+            if stopped_before <= last_update:  
+                node_uptimes.append( (uptime, node_run.online, node_run.last_update) ) 
         else:     #  "all"
-            node_uptimes.append( (node_run['uptime_s'], node_run['online'], node_run['last_update']) ) 
+            node_uptimes.append( (uptime, node_run.online, node_run.last_update) ) 
     
     # print(len(node_uptimes))
 
@@ -188,6 +582,191 @@ def Get_Uptimes(data_list, start, end, mode, gpu):
     return node_uptimes
 
 
+# Get the startup phase timeline of each node run, in seconds since its process was created
+# Only node runs reported by agents with the phase instrumentation have one
+def Get_Startup_Phases(data_list):
+    startup_phases = []
+
+    for node_run in data_list:
+        phases = node_run.get('startup_phases_s')
+        if phases:
+            startup_phases.append( (node_run['online'], phases) )
+
+    print(f"Node runs with startup phases: {len(startup_phases)}")
+    for phase in STARTUP_PHASES + ['network_test_done']:
+        values = [ phases[phase] for _, phases in startup_phases if phase in phases ]
+        if values:
+            print(f"{phase}: Ave {sum(values)/len(values):.1f}s, Min {min(values):.1f}s, Max {max(values):.1f}s ({len(values)} runs)")
+
+    return startup_phases
+
+
+# Get the mining throughput of each node run: the node total and, on multi-GPU nodes, per GPU
+# Averages of the last 10 history rows, like Get_Performance_Variance
+def Get_Node_Throughput(data_list):
+    node_throughput = []
+
+    for node_run in data_list:
+        if len(node_run.get('history', ())) < 10:
+            continue
+        rows = [ entry.split(",") for entry in node_run['history'][-10:] ]
+        gpu_number = node_run.get('gpu_number', 1)
+
+        performance = Get_Column_Index(node_run, 'performance_sol_s')
+        total = round(sum(float(row[performance]) for row in rows) / 10, 3)
+
+        per_gpu = []
+        if 'gpu0_performance_sol_s' in node_run.get('history_column', HISTORY_COLUMN):
+            for i in range(gpu_number):
+                index = Get_Column_Index(node_run, f'gpu{i}_performance_sol_s')
+                per_gpu.append( round(sum(float(row[index]) for row in rows) / 10, 3) )
+
+        node_throughput.append( (node_run['online'], node_run['gpu_type'], gpu_number, total, per_gpu) )
+
+    # Aggregate by the number of GPUs per node
+    for gpu_number in sorted(set(x[2] for x in node_throughput)):
+        totals = [ x[3] for x in node_throughput if x[2] == gpu_number ]
+        print(f"{gpu_number}-GPU nodes: {len(totals)}, average node throughput: {sum(totals)/len(totals):.2f} sol/s")
+
+    return node_throughput
+
+
+# Get the miner log event totals (accepted, rejected, reconnects, errors) of each node run
+# Only node runs reported by agents with the miner log tailer have them
+def Get_Miner_Events(data_list):
+    miner_events = []
+    totals = Counter()
+
+    for node_run in data_list:
+        events = node_run.get('miner_events')
+        if events:
+            miner_events.append( (node_run['online'], events) )
+            totals.update(events)
+
+    print(f"Node runs with miner events: {len(miner_events)}")
+    for event, count in totals.items():
+        print(f"{event}: {count}")
+
+    return miner_events
+
+
+# Pearson correlation of two equally long lists; None if either is constant
+def Get_Correlation(x, y):
+    n = len(x)
+    if n < 2:
+        return None
+    mean_x, mean_y = sum(x) / n, sum(y) / n
+    sxx = sum((a - mean_x) ** 2 for a in x)
+    syy = sum((b - mean_y) ** 2 for b in y)
+    if sxx == 0 or syy == 0:
+        return None
+    return sum((a - mean_x) * (b - mean_y) for a, b in zip(x, y)) / math.sqrt(sxx * syy)
+
+
+# Get the agent self-overhead of each node run, next to its hashrate, over the mining rows after the first
+# (which carries the agent startup): the agent CPU % (its own and its exited children's), mean RSS, max threads and
+# mean tick time, the mean report serialization and upload time of the report intervals, the correlation of the agent
+# CPU with performance_sol_s, and the mean hashrate of the report intervals relative to the other intervals
+# Only node runs reported by agents with the overhead columns have them
+def Get_Agent_Overhead(data_list):
+    agent_overhead = []
+
+    for node_run in data_list:
+        if 'agent_cpu_s' not in node_run.get('history_column', HISTORY_COLUMN) or len(node_run.get('history', [])) < 3:
+            continue
+        sol, cpu, children, rss, threads, tick, report, upload = Get_History_Columns(node_run,
+            ['performance_sol_s', 'agent_cpu_s', 'agent_children_cpu_s', 'agent_rss_MB', 'agent_threads', 'agent_tick_ms', 'agent_report_ms', 'agent_upload_ms'])
+        interval = node_run.get('metric_interval_s', 60)
+        rows = [ i for i in range(1, len(sol)) if sol[i] > 0 ]
+        if len(rows) < 2:
+            continue
+
+        cpu_pct = [ (cpu[i] + children[i]) / interval * 100 for i in rows ]
+        reporting = [ i for i in rows if report[i] > 0 or upload[i] > 0 ]
+        quiet = [ i for i in rows if report[i] == 0 and upload[i] == 0 ]
+        report_ratio = None
+        if reporting and quiet and sum(sol[i] for i in quiet) > 0:
+            report_ratio = (sum(sol[i] for i in reporting) / len(reporting)) / (sum(sol[i] for i in quiet) / len(quiet))
+
+        agent_overhead.append( { 'online': node_run['online'],
+                                 'gpu_type': node_run.get('gpu_type', "none"),
+                                 'agent_cpu_%': round(sum(cpu_pct) / len(cpu_pct), 3),
+                                 'agent_rss_MB': round(sum(rss[i] for i in rows) / len(rows), 1),
+                                 'agent_threads': max(threads[i] for i in rows),
+                                 'agent_tick_ms': round(sum(tick[i] for i in rows) / len(rows), 1),
+                                 'agent_report_ms': round(sum(report[i] for i in reporting) / len(reporting), 1) if reporting else None,
+                                 'agent_upload_ms': round(sum(upload[i] for i in reporting) / len(reporting), 1) if reporting else None,
+                                 'correlation': Get_Correlation(cpu_pct, [ sol[i] for i in rows ]),
+                                 'report_ratio': report_ratio } )
+
+    print(f"Node runs with agent overhead: {len(agent_overhead)}")
+    if agent_overhead:
+        for name in ( 'agent_cpu_%', 'agent_rss_MB', 'agent_tick_ms', 'agent_report_ms', 'agent_upload_ms' ):
+            values = [ x[name] for x in agent_overhead if x[name] is not None ]
+            if values:
+                print(f"{name}: Ave {sum(values)/len(values):.2f}, Max {max(values):.2f}")
+        correlations = sorted( x['correlation'] for x in agent_overhead if x['correlation'] is not None )
+        if correlations:
+            print(f"Agent CPU vs performance_sol_s correlation: median {Get_Percentile(correlations, 0.5):.3f} ({len(correlations)} runs)")
+        ratios = [ x['report_ratio'] for x in agent_overhead if x['report_ratio'] is not None ]
+        if ratios:
+            print(f"Hashrate of the report intervals relative to the others: Ave {sum(ratios)/len(ratios):.4f} ({len(ratios)} runs)")
+
+    return agent_overhead
+
+
+# GPU class by VRAM, as in Get_Uptimes: "high" >= 20000 MiB, "low" < 10000 MiB, otherwise "mid"
+def Get_GPU_Class(node_run):
+    if "gpu_vram_total_MiB" not in node_run: # the GPU check failed
+        return "none"
+    if node_run["gpu_vram_total_MiB"] >= 20000:
+        return "high"
+    if node_run["gpu_vram_total_MiB"] < 10000:
+        return "low"
+    return "mid"
+
+
+# Nearest-rank percentile of a sorted list
+def Get_Percentile(sorted_values, q):
+    return sorted_values[ max(0, min(len(sorted_values), round(q * len(sorted_values) + 0.5)) - 1) ]
+
+
+# Grouped uptime engine: classify every node run once into (state, gpu_class, gpu_type, country),
+# and add it to every group key where each partition is either its value or "all"
+# Returns {key: stats}, e.g. groups[('stopped', 'high', 'all', 'all')]['mean']; uptimes are as in Get_Uptimes
+def Get_Uptime_Groups(data_list, start, end, partitions=UPTIME_PARTITIONS, covered=False):
+    stopped_before = Datetime_Epoch(end - TIME_INTERVAL_10MIN)
+    start, end = Datetime_Epoch(start), Datetime_Epoch(end)
+    uptimes = defaultdict(list)
+
+    for node_run in data_list:
+        online = node_run.online_epoch
+        if online < start or online >= end:
+            continue
+        last_update = node_run.last_update_epoch
+
+        values = { 'state':     "stopped" if last_update < stopped_before else "running",
+                   'gpu_class': Get_GPU_Class(node_run),
+                   'gpu_type':  node_run.get('gpu_type', "none"),
+                   'country':   node_run.get('country', "none") }
+        uptime = (node_run.get('covered_s', node_run.uptime_s) if covered else node_run.uptime_s, node_run.online, node_run.last_update)
+        for key in product(*[ (values[p], "all") for p in partitions ]):
+            uptimes[key].append(uptime)
+
+    groups = {}
+    for key, group in uptimes.items():
+        sorted_values = sorted(u for u, _, _ in group)
+        total = len(sorted_values)
+        groups[key] = { 'count':            total,
+                        'mean':             sum(sorted_values) / total,
+                        'min':              sorted_values[0],
+                        'max':              sorted_values[-1],
+                        'quantiles':        { q: Get_Percentile(sorted_values, q) for q in UPTIME_QUANTILES },
+                        'less_than_1h_pct': sum(1 for u in sorted_values if u < 3600) / total * 100,
+                        'uptimes':          group }
+    return groups
+
+
 # Get average, min, max uptimes from a list of uptimes
 def Get_Uptimes_Ave_Min_Max(node_uptimes):
     uptimes = [uptime[0] for uptime in node_uptimes]
@@ -302,11 +881,12 @@ def Get_Performance_Variance(data_list, gpu_type):
 
     for node_run in data_list:
         if node_run['gpu_type'] == gpu_type:
-            if len(node_run['history']) < 10:
+            if len(node_run.get('history', ())) < 10:
                 continue
+            performance = Get_Column_Index(node_run, 'performance_sol_s')
             value = 0 # sum of the last 10 performance values
             for entry in node_run['history'][-10:]:
-                value += float(entry.split(",")[-6])
+                value += float(entry.split(",")[performance])
             temp = round(value/10,3)
             performance_data.append( (temp, node_run['online']) )
  
@@ -316,7 +896,8 @@ def Get_Performance_Variance(data_list, gpu_type):
     return performance_data
 
 
-DATA_LIST = Get_DataList(FOLDER_PATH)
+Instrument(globals()) # PROFILE=1 times every Get_* function, see profiling.py
+DATA_LIST = Get_Collector_DataList(COLLECTOR_PATH) if COLLECTOR_PATH else Get_DataList(FOLDER_PATH)
 
 if __name__ == "__main__":
     
@@ -1,22 +1,84 @@
 import os
 import json
+import atexit
+import hashlib
+import inspect
+import functools
 from datetime import datetime
+import numpy as np
+import matplotlib
+
+# Output settings; headless mode never opens a window, for batch runs
+PLOT_DPI        = int(os.getenv("PLOT_DPI", 600))
+PLOT_FORMAT     = os.getenv("PLOT_FORMAT", "png")        # png, svg, pdf, ...
+PLOT_HEADLESS   = os.getenv("PLOT_HEADLESS", "0") == "1"
+PLOT_MAX_POINTS = int(os.getenv("PLOT_MAX_POINTS", 2000)) # per series; longer series are min/max bucketed before plotting
+PLOT_COVERED    = os.getenv("PLOT_COVERED", "0") == "1"   # active instances and uptimes count only the minutes covered by history rows
+# Figure cache: a figure is rendered again only if its inputs changed since the files were written, see Cache_Figures
+PLOT_CACHE      = os.getenv("PLOT_CACHE", "1") == "1"
+PLOT_CACHE_FILE = os.getenv("PLOT_CACHE_FILE", "output/figure_cache.json")
+if PLOT_HEADLESS:
+    matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.ticker import MultipleLocator
 
+from profiling import Stage, Instrument, Report
+from gaps import Set_Coverage
+
 from analysis import Get_AbnormalNodeRuns, \
     Get_ActiveInstanceNumber, \
     Get_Allocation, \
-    Get_Uptimes, Get_Uptimes_Ave_Min_Max, \
+    Get_Uptime_Groups, \
     Get_Performance_Variance, \
+    Get_Startup_Phases, \
+    Get_Node_Throughput, \
+    Get_Agent_Overhead, \
+    Parse_Epoch, Datetime_Epoch, \
     DATA_LIST, \
+    HISTORY_COLUMN, STARTUP_PHASES, \
     TIMESTAMP_START,  \
     TIME_INTERVAL_1MIN, TIME_INTERVAL_1HOUR, TIME_INTERVAL_1DAY 
 
 
+FIGURE_FILES = []  # the files saved by the figure being built, for the cache manifest
+
+
+# Save the current figure with the configured dpi and format, show it unless headless, and always close it,
+# so batch runs do not accumulate figures in memory
+def Save_Figure(file_name, show=True, **kwargs):
+    file_name = os.path.splitext(file_name)[0] + "." + PLOT_FORMAT
+    with Stage("savefig"):  # rasterization, apart from the plotting
+        plt.savefig(file_name, dpi=PLOT_DPI, **kwargs)
+    FIGURE_FILES.append(file_name)
+    if show and not PLOT_HEADLESS:
+        plt.show()
+    plt.close()
+
+
+# Min/max bucketing: split a long series into buckets and keep the min and the max point of each bucket,
+# so short dips and spikes still show up. Returns the indices to plot, in order
+def Downsample_Indices(y, max_points=PLOT_MAX_POINTS):
+    y = np.asarray(y, dtype=float)
+    if len(y) <= max_points:
+        return np.arange(len(y))
+    index = [0, len(y) - 1]
+    for bucket in np.array_split(np.arange(len(y)), max_points // 2):
+        index += [ bucket[np.argmin(y[bucket])], bucket[np.argmax(y[bucket])] ]
+    return np.unique(index)
+
+
+# Downsample x and each series in ys with one shared set of indices (the union of the per-series min/max points)
+def Downsample(x, *ys, max_points=PLOT_MAX_POINTS):
+    if len(x) <= max_points:
+        return (x,) + ys
+    index = np.unique(np.concatenate([ Downsample_Indices(y, max(2, max_points // len(ys))) for y in ys ]))
+    return ([x[i] for i in index],) + tuple([y[i] for i in index] for y in ys)
+
+
 def Plot_Startup_Times(end_time, file_name):
-    temp = Get_ActiveInstanceNumber(DATA_LIST, TIMESTAMP_START, end_time, TIME_INTERVAL_1MIN)
+    temp = Get_ActiveInstanceNumber(DATA_LIST, TIMESTAMP_START, end_time, TIME_INTERVAL_1MIN, PLOT_COVERED)
 
     timestamps = [datetime.strptime(t, '%Y-%m-%d %H:%M:%S') for t, _ in temp]
     values = [v for _, v in temp]
@@ -32,14 +94,49 @@ def Plot_Startup_Times(end_time, file_name):
     plt.grid(True)
 
     plt.tight_layout()
-    plt.savefig(file_name, dpi=600)
+    Save_Figure(file_name, show=False)
+
+
+# Where each node run's time-to-first-hash goes: one stacked bar per node run, one segment per startup phase
+def Plot_Startup_Phases(file_name):
+    startup_phases = Get_Startup_Phases(DATA_LIST)
+    if not startup_phases:
+        print("No startup phases to plot")
+        return
+
+    startup_phases.sort(key=lambda x: x[1].get('first_hash', float('inf')))
+    indices = list(range(len(startup_phases)))
+    colors = ['lightgray', 'skyblue', 'orange', 'green', 'purple']
+
+    plt.figure(figsize=(15, 6))
+    left = [0] * len(startup_phases)
+    for phase, color in zip(STARTUP_PHASES, colors):
+        # The segment ends at this phase; a phase not reached yet adds nothing
+        ends = [ phases.get(phase, l) for (_, phases), l in zip(startup_phases, left) ]
+        widths = [ max(0, e - l) for e, l in zip(ends, left) ]
+        plt.barh(indices, widths, left=left, color=color, label=f"to {phase}")
+        left = [ l + w for l, w in zip(left, widths) ]
+
+    network = [ (i, phases['network_test_done']) for i, (_, phases) in enumerate(startup_phases) if 'network_test_done' in phases ]
+    if network:
+        plt.scatter([t for _, t in network], [i for i, _ in network], color='red', marker='|', s=40, zorder=3, label="network_test_done")
+
+    plt.xlabel('Seconds since process start')
+    plt.ylabel('Instance Runs (sorted by time to first hash)')
+    plt.title(f'Startup Phase Timeline ({len(startup_phases)} samples)')
+    plt.legend(loc="lower right")
+    plt.grid(axis='x', alpha=0.75)
+
+    plt.tight_layout()
+    Save_Figure(file_name, show=False)
 
 
 def Plot_Node_Run_to_Request_Ratio(start_time, end_time, title, file_name):
-    temp = Get_ActiveInstanceNumber(DATA_LIST, start_time, end_time, TIME_INTERVAL_1MIN)
+    temp = Get_ActiveInstanceNumber(DATA_LIST, start_time, end_time, TIME_INTERVAL_1MIN, PLOT_COVERED)
 
     timestamps = [datetime.strptime(t, '%Y-%m-%d %H:%M:%S') for t, _ in temp]
     values = [v for _, v in temp]
+    timestamps, values = Downsample(timestamps, values)
 
     plt.figure(figsize=(15, 6))
     plt.plot(timestamps, values, marker='o', markersize=1)
@@ -53,7 +150,7 @@ def Plot_Node_Run_to_Request_Ratio(start_time, end_time, title, file_name):
     plt.gcf().autofmt_xdate()  # Rotate labels to avoid overlap
 
     plt.tight_layout()
-    plt.savefig(file_name, dpi=600)
+    Save_Figure(file_name, show=False)
 
 
 def Plot_Allocation(start_time, end_time, interval, title, file_name):
@@ -61,6 +158,7 @@ def Plot_Allocation(start_time, end_time, interval, title, file_name):
 
     timestamps = [datetime.strptime(t, '%Y-%m-%d %H:%M:%S') for t, _ in temp]
     values = [v for _, v in temp]
+    timestamps, values = Downsample(timestamps, values)
 
     plt.figure(figsize=(15, 5))
     plt.plot(timestamps, values, marker='o', markersize=1)
@@ -74,15 +172,23 @@ def Plot_Allocation(start_time, end_time, interval, title, file_name):
     plt.gcf().autofmt_xdate()  # Rotate labels to avoid overlap
 
     plt.tight_layout()
-    plt.savefig(file_name, dpi=600)
+    Save_Figure(file_name, show=False)
 
 
-def Plot_Uptime_Distribution(start_time, end_time, mode, gpu, title, file_name): 
-    node_uptimes = Get_Uptimes(DATA_LIST, start_time, end_time, mode, gpu)
-    uptimes_hr = [uptime[0] / 3600 for uptime in node_uptimes]  # convert seconds to hours
+# groups: the output of Get_Uptime_Groups for the same start and end times, computed once for all partitions
+def Plot_Uptime_Distribution(start_time, end_time, mode, gpu, title, file_name, groups=None):
+    if groups is None:
+        groups = Get_Uptime_Groups(DATA_LIST, start_time, end_time, covered=PLOT_COVERED)
+    group = groups.get( (mode, gpu, 'all', 'all') )
+    if group is None:
+        print(f"No node runs to plot for mode: {mode}, gpu: {gpu}")
+        return
+    uptimes_hr = [uptime[0] / 3600 for uptime in group['uptimes']]  # convert seconds to hours
 
+    print(f"Total nodes: {group['count']}")
+    print(f"Nodes with <1 hour uptime: {round(group['less_than_1h_pct'] * group['count'] / 100)} ({group['less_than_1h_pct']:.1f}%)")
     print(f"Node Runs: {len(uptimes_hr)}")
-    ut_ave, ut_min, ut_max = Get_Uptimes_Ave_Min_Max(node_uptimes)
+    ut_ave, ut_min, ut_max = group['mean'], group['min'], group['max']
     print(f"Uptime (h) - Ave: {ut_ave/3600:.2f}, Min: {ut_min/3600:.2f}, Max: {ut_max/3600:.2f}")
 
     # Histogram
@@ -103,11 +209,10 @@ def Plot_Uptime_Distribution(start_time, end_time, mode, gpu, title, file_name):
     plt.legend()
 
     plt.tight_layout()
-    plt.savefig(file_name, dpi=600)
-    plt.show()
+    Save_Figure(file_name)
 
 
-def Plot_Performance_Single(history, file_prefix, output_dir, messages):
+def Plot_Performance_Single(history, file_prefix, output_dir, messages, history_column=HISTORY_COLUMN):
     # --- Storage ---
     timestamps = []
     performance_list = []
@@ -118,30 +223,47 @@ def Plot_Performance_Single(history, file_prefix, output_dir, messages):
     gpu_util_list = []
     cpu_ram_used_list = []
     cpu_percent_list = []
+    performance_min_list = []   # per-interval aggregates, only with high-frequency sampling
+    performance_max_list = []
+    power_min_list = []
+    power_max_list = []
+
+    columns = [ column.strip() for column in history_column.split(',') ]
+    index = { name: i for i, name in enumerate(columns) }
+    sampled = 'performance_sol_s_min' in index
+    epoch = 'timestamp_epoch' in index
 
     # --- Parse history ---
     for record in history:
-        (
-            no, timestamp, gpu_vram_used_percent, gpu_vram_utilization,
-            gpu_utilization, gpu_temperature_C, cpu_percent, cpu_ram_used,
-            performance_sol_s, power_watts, core_temp_C, core_clock_MHz,
-            accepted, rejected
-        ) = record.split(',')
-
-        try:
-            ts = datetime.fromisoformat(timestamp.strip())
-        except ValueError:
-            ts = timestamp.strip()  # fallback
-
-        timestamps.append(ts)
-        performance_list.append(float(performance_sol_s))
-        power_list.append(float(power_watts))
-        core_temp_list.append(float(core_temp_C))
-        core_clock_list.append(float(core_clock_MHz))
-        gpu_vram_used_list.append(float(gpu_vram_used_percent))
-        gpu_util_list.append(float(gpu_utilization))
-        cpu_ram_used_list.append(float(cpu_ram_used))
-        cpu_percent_list.append(float(cpu_percent))
+        fields = record.split(',')
+        timestamps.append(int(fields[index['timestamp_epoch']]) if epoch else Parse_Epoch(fields[index['timestamp']]))
+        performance_list.append(float(fields[index['performance_sol_s']]))
+        power_list.append(float(fields[index['power_watts']]))
+        core_temp_list.append(float(fields[index['core_temp_C']]))
+        core_clock_list.append(float(fields[index['core_clock_MHz']]))
+        gpu_vram_used_list.append(float(fields[index['gpu_vram_used_percent_%']]))
+        gpu_util_list.append(float(fields[index['gpu_utilization_%']]))
+        cpu_ram_used_list.append(float(fields[index['cpu_ram_used_%']]))
+        cpu_percent_list.append(float(fields[index['cpu_percent_%']]))
+        if sampled:
+            performance_min_list.append(float(fields[index['performance_sol_s_min']]))
+            performance_max_list.append(float(fields[index['performance_sol_s_max']]))
+            power_min_list.append(float(fields[index['power_watts_min']]))
+            power_max_list.append(float(fields[index['power_watts_max']]))
+
+    timestamps = np.array(timestamps, dtype='datetime64[s]')  # epoch seconds, converted once for the time axis
+
+    # --- Downsample long histories (min/max per bucket, the bands keep their own extremes) ---
+    if sampled:
+        timestamps, performance_list, power_list, core_temp_list, core_clock_list, gpu_vram_used_list, gpu_util_list, \
+            cpu_ram_used_list, cpu_percent_list, performance_min_list, performance_max_list, power_min_list, power_max_list = \
+            Downsample(timestamps, performance_list, power_list, core_temp_list, core_clock_list, gpu_vram_used_list, gpu_util_list,
+                       cpu_ram_used_list, cpu_percent_list, performance_min_list, performance_max_list, power_min_list, power_max_list)
+    else:
+        timestamps, performance_list, power_list, core_temp_list, core_clock_list, gpu_vram_used_list, gpu_util_list, \
+            cpu_ram_used_list, cpu_percent_list = \
+            Downsample(timestamps, performance_list, power_list, core_temp_list, core_clock_list, gpu_vram_used_list, gpu_util_list,
+                       cpu_ram_used_list, cpu_percent_list)
 
     # --- Combined figure with 2 subplots ---
     fig, axs = plt.subplots(2, 1, figsize=(15, 10), sharex=True)
@@ -149,6 +271,8 @@ def Plot_Performance_Single(history, file_prefix, output_dir, messages):
     # --- Subplot 1: Power & Core Clock ---
     axs[0].plot(timestamps, power_list, label="Power (W)", color="green")
     axs[0].plot(timestamps, core_clock_list, label="Core Clock (MHz)", color="blue")
+    if sampled:
+        axs[0].fill_between(timestamps, power_min_list, power_max_list, color="green", alpha=0.2, label="Power min-max (W)")
     axs[0].set_ylabel("Value")
     axs[0].set_title(f"Power & Core Clock vs Time ({file_prefix})")
     axs[0].legend(loc="upper left", bbox_to_anchor=(1, 1))
@@ -156,6 +280,8 @@ def Plot_Performance_Single(history, file_prefix, output_dir, messages):
 
     # --- Subplot 2: Performance & Utilization & Core Temp ---
     axs[1].plot(timestamps, performance_list, label="Performance (sol/s)", color="black")
+    if sampled:
+        axs[1].fill_between(timestamps, performance_min_list, performance_max_list, color="black", alpha=0.2, label="Performance min-max (sol/s)")
     axs[1].plot(timestamps, gpu_vram_used_list, label="GPU VRAM Used (%)", color="orange")
     axs[1].plot(timestamps, gpu_util_list, label="GPU Utilization (%)", color="brown")
     axs[1].plot(timestamps, cpu_ram_used_list, label="CPU RAM Used (%)", color="pink")
@@ -179,8 +305,7 @@ def Plot_Performance_Single(history, file_prefix, output_dir, messages):
 
     # --- Finalize & save ---
     plt.tight_layout(rect=[0, 0.03, 1, 0.97])  # leave space for messages box
-    plt.savefig(f"{output_dir}/{file_prefix}.png", dpi=600, bbox_inches="tight")
-    plt.show()
+    Save_Figure(f"{output_dir}/{file_prefix}.png", bbox_inches="tight")
 
 
 def Plot_Abnormal_Samples():
@@ -204,7 +329,7 @@ def Plot_Abnormal_Samples():
                     "Country":     node_run['country'],
                 }
 
-                Plot_Performance_Single( node_run['history'], file_prefix, "output_abnormal", messages )
+                Plot_Performance_Single( node_run['history'], file_prefix, "output_abnormal", messages, node_run.get('history_column', HISTORY_COLUMN) )
 
 
 def Plot_Normal_Samples(N):
@@ -213,6 +338,9 @@ def Plot_Normal_Samples(N):
 
     for node_run in sorted_list:
 
+        if not node_run.get('history'):  # not loaded (DATA_HISTORY=none)
+            continue
+
         if node_run['online'] in [ab[1] for ab in Get_AbnormalNodeRuns(DATA_LIST)]:
             print("Skip abnormal sample: ", node_run['online'])
             continue
@@ -229,7 +357,7 @@ def Plot_Normal_Samples(N):
             "Country":     node_run['country'],
         }
 
-        Plot_Performance_Single( node_run['history'], file_prefix, "output_normal", messages )
+        Plot_Performance_Single( node_run['history'], file_prefix, "output_normal", messages, node_run.get('history_column', HISTORY_COLUMN) )
 
 
 def Plot_Performance_Variance(gpu_type, file_name):
@@ -277,8 +405,60 @@ def Plot_Performance_Variance(gpu_type, file_name):
     )
 
     plt.tight_layout()
-    plt.savefig(file_name, dpi=600)
-    plt.show()
+    Save_Figure(file_name)
+
+
+# Node throughput, with multi-GPU nodes aggregated over all their GPUs
+def Plot_Node_Throughput(file_name):
+    node_throughput = Get_Node_Throughput(DATA_LIST)
+
+    if not node_throughput:
+        print("No throughput data to plot")
+        return
+
+    plt.figure(figsize=(15, 6))
+    for gpu_number in sorted(set(x[2] for x in node_throughput)):
+        points = [ (i, x[3]) for i, x in enumerate(node_throughput) if x[2] == gpu_number ]
+        average = sum(p for _, p in points) / len(points)
+        plt.scatter([i for i, _ in points], [p for _, p in points], alpha=0.7,
+                    label=f"{gpu_number} GPU(s): {len(points)} nodes, Avg = {average:.2f}")
+    plt.xlabel("Sample Index")
+    plt.ylabel("Node Throughput (sol/s)")
+    plt.title(f"Node Throughput, all GPUs per node ({len(node_throughput)} samples)")
+    plt.legend()
+    plt.grid(True)
+
+    plt.tight_layout()
+    Save_Figure(file_name)
+
+
+# Agent overhead vs. hashrate per node run: the agent CPU % against the correlation of the agent CPU with the hashrate,
+# and the hashrate of the report intervals relative to the others (1 = no measurable cost of reporting)
+def Plot_Agent_Overhead(file_name):
+    agent_overhead = Get_Agent_Overhead(DATA_LIST)
+    if not agent_overhead:
+        print("No agent overhead to plot")
+        return
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+    points = [ (x['agent_cpu_%'], x['correlation']) for x in agent_overhead if x['correlation'] is not None ]
+    ax1.scatter([p[0] for p in points], [p[1] for p in points], alpha=0.7)
+    ax1.axhline(0, color='gray', linewidth=1)
+    ax1.set_xlabel('Agent CPU (% of one vCPU)')
+    ax1.set_ylabel('Correlation of agent CPU with performance_sol_s')
+    ax1.set_title(f'Agent CPU vs. Hashrate ({len(points)} samples)')
+    ax1.grid(True)
+
+    ratios = [ x['report_ratio'] for x in agent_overhead if x['report_ratio'] is not None ]
+    ax2.scatter(range(len(ratios)), ratios, alpha=0.7, color='orange')
+    ax2.axhline(1, color='gray', linewidth=1)
+    ax2.set_xlabel('Sample Index')
+    ax2.set_ylabel('Hashrate of report intervals / other intervals')
+    ax2.set_title(f'Hashrate While Reporting ({len(ratios)} samples' + (f', Avg = {sum(ratios)/len(ratios):.4f})' if ratios else ')'))
+    ax2.grid(True)
+
+    plt.tight_layout()
+    Save_Figure(file_name, show=False)
 
 
 def Plot_Performance_Variance1(gpu_type, file_name):
@@ -299,20 +479,122 @@ def Plot_Performance_Variance1(gpu_type, file_name):
     plt.grid(True)
 
     plt.tight_layout()
-    plt.savefig(file_name, dpi=600)
-    plt.show()
+    Save_Figure(file_name)
+
+
+# Content-addressed figure cache. The key of a figure build is a hash of
+#   - the code: the plot function, the shared plotting helpers, and the analysis modules it reads the data through
+#   - the parameters: every argument, and the output settings (dpi, format, max points, covered-only)
+#   - the data slice: the rows of the history passed in for per-node plots, otherwise the node runs of DATA_LIST overlapping the
+#     time window of the datetime arguments (all node runs if none), by online, machine, last update and row count
+# PLOT_CACHE_FILE maps each key to the files the build wrote; a build whose key is there, with all its files still in
+# place, is skipped. A finished run or a closed window keeps its key, so a refresh only renders what changed
+# The file is read once by Cache_Figures, and written back by Flush_Figure_Cache at exit if a figure was rendered
+FIGURE_CODE    = [ inspect.getsource(fn) for fn in (Save_Figure, Downsample_Indices, Downsample) ] + \
+                 [ open(os.path.join(os.path.dirname(os.path.abspath(__file__)), f), encoding="utf-8").read() for f in ("analysis.py", "gaps.py") ]
+FIGURE_DERIVED = ( 'groups', )  # arguments derived from the data slice, e.g. Get_Uptime_Groups of the same window
+FIGURE_CACHE   = {}             # key: [files], the contents of PLOT_CACHE_FILE
+FIGURE_CHANGED = [False]        # a figure was rendered since the file was read
+
+
+def Read_Figure_Cache():
+    try:
+        with open(PLOT_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def Write_Figure_Cache(cache):
+    os.makedirs(os.path.dirname(PLOT_CACHE_FILE) or ".", exist_ok=True)
+    with open(PLOT_CACHE_FILE + ".tmp", "w") as f:
+        json.dump(cache, f, indent=1)
+    os.replace(PLOT_CACHE_FILE + ".tmp", PLOT_CACHE_FILE)
+
+
+# Write the cache back if a figure was rendered since; at exit, or by Shutdown
+def Flush_Figure_Cache():
+    if FIGURE_CHANGED[0]:
+        Write_Figure_Cache(FIGURE_CACHE)
+        FIGURE_CHANGED[0] = False
+
+
+# Exit without waiting on the open figure windows; os._exit skips the atexit handlers, so the figure cache and the
+# profile (PROFILE=1) are written here first
+def Shutdown(code=0):
+    Flush_Figure_Cache()
+    Report()
+    os._exit(code)
+
+
+# The data slice of a figure: a hash of all the rows of a history, or the node runs overlapping a time window
+def Get_Figure_Data(arguments):
+    if 'history' in arguments:
+        return hashlib.sha256("\n".join(arguments['history']).encode("utf-8")).hexdigest()
+    times = [ Datetime_Epoch(x) for x in arguments.values() if isinstance(x, datetime) ]
+    start, end = (min(times), max(times)) if len(times) > 1 else (float('-inf'), times[0] if times else float('inf'))
+    return "\n".join(f"{node_run.online_epoch},{node_run.get('salad_machine_id')},{node_run.last_update_epoch},{node_run.get('no')}"
+                     for node_run in DATA_LIST if node_run.online_epoch <= end and node_run.last_update_epoch >= start)
+
+
+def Get_Figure_Key(fn, code, args, kwargs):
+    arguments = inspect.signature(fn).bind(*args, **kwargs)
+    arguments.apply_defaults()
+    arguments = arguments.arguments
+    parameters = [ (name, value) for name, value in arguments.items() if name not in FIGURE_DERIVED and name != 'history' ]
+    digest = hashlib.sha256()
+    for part in code + [ repr(parameters), repr((PLOT_DPI, PLOT_FORMAT, PLOT_MAX_POINTS, PLOT_COVERED)), Get_Figure_Data(arguments) ]:
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Wrap the Plot_* functions writing a figure (with a file_name or output_dir argument) of a module namespace with the cache
+def Cache_Figures(names):
+    if not PLOT_CACHE:
+        return
+    FIGURE_CACHE.update(Read_Figure_Cache())
+    atexit.register(Flush_Figure_Cache)
+    for name, fn in list(names.items()):
+        if not (name.startswith("Plot_") and callable(fn)):
+            continue
+        parameters = inspect.signature(fn).parameters
+        if 'file_name' not in parameters and 'output_dir' not in parameters:
+            continue
+
+        def cached(*args, fn=fn, code=FIGURE_CODE + [ inspect.getsource(fn) ], **kwargs):
+            key = Get_Figure_Key(fn, code, args, kwargs)
+            if key in FIGURE_CACHE and all(os.path.exists(f) for f in FIGURE_CACHE[key]):
+                print(f"----> {fn.__name__}: unchanged, skipped {', '.join(FIGURE_CACHE[key])}")
+                return
+            FIGURE_FILES.clear()
+            result = fn(*args, **kwargs)
+            if FIGURE_FILES:
+                for k in [ k for k, files in FIGURE_CACHE.items() if set(files) & set(FIGURE_FILES) ]:
+                    del FIGURE_CACHE[k]
+                FIGURE_CACHE[key] = list(FIGURE_FILES)
+                FIGURE_CHANGED[0] = True
+            return result
+        names[name] = functools.update_wrapper(cached, fn)
 
 
+Cache_Figures(globals())
+Instrument(globals()) # PROFILE=1 times every Plot_* function, see profiling.py
 
 
 if __name__ == "__main__":
 
+    if PLOT_COVERED:
+        print("----> Finding the gaps of the node runs")
+        Set_Coverage(DATA_LIST)
 
     print("----> Plotting Startup times")
     start_time = TIMESTAMP_START
     end_time = start_time + TIME_INTERVAL_1HOUR * 2
     Plot_Startup_Times(end_time, "output/1011_startup_times.png")
 
+    print("----> Plotting Startup phases")
+    Plot_Startup_Phases("output/1012_startup_phases.png")
+
     print("----> Plotting Node Run to Request Ratio")
     start_time = TIMESTAMP_START
     end_time = start_time + TIME_INTERVAL_1DAY * 7
@@ -343,24 +625,25 @@ if __name__ == "__main__":
 
     start_time = TIMESTAMP_START
     end_time = start_time + TIME_INTERVAL_1DAY * 7
+    uptime_groups = Get_Uptime_Groups(DATA_LIST, start_time, end_time, covered=PLOT_COVERED)  # one pass for all partitions
     print("----> Plotting Instance Uptimes - All Instances")
-    Plot_Uptime_Distribution(start_time, end_time, 'all',     'all', "Instance Uptime Distribution - All Instances",                     "output/1041_uptime_distribution_all_all.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'all',     'all', "Instance Uptime Distribution - All Instances",                     "output/1041_uptime_distribution_all_all.png", uptime_groups)
     print("----> Plotting Instance Uptimes - Stopped Instances")
-    Plot_Uptime_Distribution(start_time, end_time, 'stopped', 'all', "Instance Uptime Distribution - Stopped Instances",                 "output/1042_uptime_distribution_stopped_all.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'stopped', 'all', "Instance Uptime Distribution - Stopped Instances",                 "output/1042_uptime_distribution_stopped_all.png", uptime_groups)
     print("----> Plotting Instance Uptimes - Running Instances")
-    Plot_Uptime_Distribution(start_time, end_time, 'running', 'all', "Instance Uptime Distribution - Running Instances",                 "output/1043_uptime_distribution_running_all.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'running', 'all', "Instance Uptime Distribution - Running Instances",                 "output/1043_uptime_distribution_running_all.png", uptime_groups)
     print("----> Plotting Instance Uptimes - All Instances, high-end GPUs")
-    Plot_Uptime_Distribution(start_time, end_time, 'all',     'high', "Instance Uptime Distribution - All Instances, high-end GPUs",     "output/1044_uptime_distribution_all_high.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'all',     'high', "Instance Uptime Distribution - All Instances, high-end GPUs",     "output/1044_uptime_distribution_all_high.png", uptime_groups)
     print("----> Plotting Instance Uptimes - Stopped Instances, high-end GPUs")
-    Plot_Uptime_Distribution(start_time, end_time, 'stopped', 'high', "Instance Uptime Distribution - Stopped Instances, high-end GPUs", "output/1045_uptime_distribution_stopped_high.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'stopped', 'high', "Instance Uptime Distribution - Stopped Instances, high-end GPUs", "output/1045_uptime_distribution_stopped_high.png", uptime_groups)
     print("----> Plotting Instance Uptimes - Running Instances, high-end GPUs")
-    Plot_Uptime_Distribution(start_time, end_time, 'running', 'high', "Instance Uptime Distribution - Running Instances, high-end GPUs", "output/1046_uptime_distribution_running_high.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'running', 'high', "Instance Uptime Distribution - Running Instances, high-end GPUs", "output/1046_uptime_distribution_running_high.png", uptime_groups)
     print("----> Plotting Instance Uptimes - All Instances, low-end GPUs")
-    Plot_Uptime_Distribution(start_time, end_time, 'all',     'low', "Instance Uptime Distribution - All Instances, low-end GPUs",       "output/1047_uptime_distribution_all_low.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'all',     'low', "Instance Uptime Distribution - All Instances, low-end GPUs",       "output/1047_uptime_distribution_all_low.png", uptime_groups)
     print("----> Plotting Instance Uptimes - Stopped Instances, low-end GPUs")
-    Plot_Uptime_Distribution(start_time, end_time, 'stopped', 'low', "Instance Uptime Distribution - Stopped Instances, low-end GPUs",   "output/1048_uptime_distribution_stopped_low.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'stopped', 'low', "Instance Uptime Distribution - Stopped Instances, low-end GPUs",   "output/1048_uptime_distribution_stopped_low.png", uptime_groups)
     print("----> Plotting Instance Uptimes - Running Instances, low-end GPUs")
-    Plot_Uptime_Distribution(start_time, end_time, 'running', 'low', "Instance Uptime Distribution - Running Instances, low-end GPUs",   "output/1049_uptime_distribution_running_low.png")
+    Plot_Uptime_Distribution(start_time, end_time, 'running', 'low', "Instance Uptime Distribution - Running Instances, low-end GPUs",   "output/1049_uptime_distribution_running_low.png", uptime_groups)
 
     print("----> Plotting performance data samples for NVIDIA GeForce RTX 3060:")
     Plot_Performance_Variance("NVIDIA GeForce RTX 3060", "output/performance_variance_3060.png")  
@@ -371,6 +654,12 @@ if __name__ == "__main__":
     print("----> Plotting performance data samples for NVIDIA GeForce RTX 5090:")
     Plot_Performance_Variance("NVIDIA GeForce RTX 5090", "output/performance_variance_5090.png")  
 
+    print("----> Plotting node throughput")
+    Plot_Node_Throughput("output/performance_node_throughput.png")
+
+    print("----> Plotting agent overhead")
+    Plot_Agent_Overhead("output/performance_agent_overhead.png")
+
     print("----> Plotting Normal Samples")
     Plot_Normal_Samples(20)
     
@@ -379,7 +668,7 @@ if __name__ == "__main__":
     
 
 
-    os._exit(0)
+    Shutdown()
 
 
 
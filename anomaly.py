@@ -0,0 +1,147 @@
+import warnings
+from collections import Counter
+import numpy as np
+
+from profiling import Instrument
+from analysis import Get_History_Columns, \
+    DATA_LIST
+
+
+# Fleet-wide anomaly detection over the full history of every node run
+# The runs are stacked into padded 2-D arrays (runs x rows, NaN padded) in batches,
+# and each detector is a vectorized rolling-window or change-point test over the whole batch
+ANOMALY_COLUMNS   = [ 'performance_sol_s', 'power_watts', 'core_temp_C', 'core_clock_MHz', 'accepted' ]
+ANOMALY_WINDOW    = 10     # rows, 10 minutes at the default metric interval
+ANOMALY_BATCH     = 256    # node runs per batch, bounds the memory of the padded arrays
+DROP_RATIO        = 0.7    # hashrate below 70% of the run median
+POWER_DROP_RATIO  = 0.6    # power below 60% of the run median
+THROTTLE_RATIO    = 0.85   # core clock below 85% of the run median ...
+THROTTLE_TEMP_C   = 83     # ... while the core is at least this hot
+SHIFT_RATIO       = 0.2    # a change point shifting the mean hashrate by 20% or more
+SHIFT_SCORE       = 8      # and standing out from the noise (standardized mean difference)
+
+
+# The nan* reductions warn on the all-NaN rows (e.g. a run that never hashed) through warnings, not np.errstate;
+# those rows come out NaN and are never flagged
+def Quiet(fn, *args, **kwargs):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return fn(*args, **kwargs)
+
+
+# Stack the history columns of a batch of node runs into padded 2-D arrays, {column: (runs, rows)}
+def Get_History_Arrays(node_runs, columns=ANOMALY_COLUMNS):
+    length = max(len(node_run['history']) for node_run in node_runs)
+    arrays = { column: np.full((len(node_runs), length), np.nan, dtype=np.float32) for column in columns }
+    arrays['no'] = np.full((len(node_runs), length), -1, dtype=np.int64)
+    for i, node_run in enumerate(node_runs):
+        if not node_run['history']:
+            continue
+        values = Get_History_Columns(node_run, ['no'] + columns)
+        arrays['no'][i, :len(values[0])] = values[0]
+        for column, x in zip(columns, values[1:]):
+            arrays[column][i, :len(x)] = x
+    return arrays
+
+
+# Mean over each window of w rows, at the window start: (runs, rows - w + 1); NaN if the window has padding
+def Rolling_Mean(x, w):
+    cs = np.cumsum(np.nan_to_num(x), axis=1, dtype=np.float64)
+    cs = np.concatenate([np.zeros((x.shape[0], 1)), cs], axis=1)
+    valid = np.cumsum(~np.isnan(x), axis=1)
+    valid = np.concatenate([np.zeros((x.shape[0], 1)), valid], axis=1)
+    mean = (cs[:, w:] - cs[:, :-w]) / w
+    mean[(valid[:, w:] - valid[:, :-w]) < w] = np.nan
+    return mean
+
+
+# Mark every row covered by a flagged window start: (runs, rows - w + 1) -> (runs, rows)
+def Cover_Windows(flags, w):
+    counts = np.cumsum(np.concatenate([flags, np.zeros((flags.shape[0], w - 1), dtype=bool)], axis=1), axis=1)
+    counts[:, w:] -= counts[:, :-w].copy()
+    return counts > 0
+
+
+# Intervals of consecutive True values in each row of a 2-D mask: [(run index, first row, last row)]
+def Get_Intervals(mask):
+    padded = np.pad(mask.astype(np.int8), ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)
+    return list(zip(starts[0], starts[1], ends[1] - 1)) # nonzero() is row-major, so starts and ends pair up
+
+
+# Change point of the hashrate per run: the split maximizing the standardized difference of the means before and after
+# Returns a mask marking the rows after a significant shift
+def Change_Point(sol, started):
+    x = np.where(started, sol, np.nan)
+    n = (~np.isnan(x)).sum(axis=1, keepdims=True).astype(np.float64)
+    cs = np.cumsum(np.nan_to_num(x), axis=1, dtype=np.float64)
+    k = np.cumsum(~np.isnan(x), axis=1).astype(np.float64)
+    total = cs[:, -1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        before = cs / k
+        after = (total - cs) / (n - k)
+        std = Quiet(np.nanstd, x, axis=1, keepdims=True) + 1e-9
+        score = np.abs(after - before) / std * np.sqrt(k * (n - k) / n)
+    # Both sides need at least one window of rows
+    score[(k < ANOMALY_WINDOW) | (n - k < ANOMALY_WINDOW) | np.isnan(x)] = 0
+    split = np.argmax(score, axis=1)
+    rows = np.arange(x.shape[0])
+    shift = np.abs(after[rows, split] - before[rows, split]) / np.maximum(np.abs(before[rows, split]), 1e-9)
+    significant = (score[rows, split] >= SHIFT_SCORE) & (shift >= SHIFT_RATIO) & (after[rows, split] < before[rows, split])
+    return significant[:, None] & (np.arange(x.shape[1])[None, :] > split[:, None]) & ~np.isnan(x)
+
+
+# Detect the anomalies of a batch of node runs: {reason: (runs, rows) mask}
+def Detect_Batch(arrays, w=ANOMALY_WINDOW):
+    sol, power, temp, clock, accepted = ( arrays[c] for c in ANOMALY_COLUMNS )
+    started = np.cumsum(np.nan_to_num(sol) > 0, axis=1) > 0  # skip the rows before the miner started hashing
+
+    def median(x):
+        return Quiet(np.nanmedian, np.where(started, x, np.nan), axis=1, keepdims=True)
+
+    def windows(flags):
+        return Cover_Windows(np.nan_to_num(flags, nan=0).astype(bool), w) & started
+
+    sol_mean, power_mean, clock_mean, temp_mean = Rolling_Mean(sol, w), Rolling_Mean(power, w), Rolling_Mean(clock, w), Rolling_Mean(temp, w)
+    accepted_delta = accepted[:, w - 1:] - accepted[:, :accepted.shape[1] - w + 1]
+    with np.errstate(invalid='ignore'):
+        return { 'Mining Stalled':     windows(sol_mean == 0),
+                 'Shares Stalled':     windows((accepted_delta == 0) & (sol_mean > 0)),
+                 'Hashrate Drop':      windows((sol_mean > 0) & (sol_mean < DROP_RATIO * median(sol))),
+                 'Power Drop':         windows(power_mean < POWER_DROP_RATIO * median(power)),
+                 'Thermal Throttling': windows((clock_mean < THROTTLE_RATIO * median(clock)) & (temp_mean >= THROTTLE_TEMP_C)),
+                 'Hashrate Shift':     Change_Point(sol, started) }
+
+
+# Screen the full history of every node run
+# Returns [(reason, online, first no, last no)], one per anomaly interval
+def Get_Anomaly_Intervals(data_list, batch=ANOMALY_BATCH):
+    anomaly_intervals = []
+    node_runs = [ node_run for node_run in data_list if len(node_run.get('history', ())) >= ANOMALY_WINDOW ]
+
+    for b in range(0, len(node_runs), batch):
+        batch_runs = node_runs[b:b + batch]
+        arrays = Get_History_Arrays(batch_runs)
+        for reason, mask in Detect_Batch(arrays).items():
+            for i, first, last in Get_Intervals(mask):
+                anomaly_intervals.append( (reason, batch_runs[i]['online'], int(arrays['no'][i, first]), int(arrays['no'][i, last])) )
+
+    anomaly_intervals.sort(key=lambda x: (x[1], x[2]))
+    counts = Counter(reason for reason, _, _, _ in anomaly_intervals)
+    print(f"Anomaly intervals: {len(anomaly_intervals)} in {len(set(x[1] for x in anomaly_intervals))} node runs")
+    for reason, count in counts.most_common():
+        print(f"{reason}: {count}")
+
+    return anomaly_intervals
+
+
+Instrument(globals())
+
+
+if __name__ == "__main__":
+
+    print("----> Anomaly intervals (reason, online, first no, last no):")
+    for anomaly in Get_Anomaly_Intervals(DATA_LIST):
+        print(anomaly)
@@ -0,0 +1,145 @@
+import os
+import io
+import csv
+import time
+import shutil
+import tracemalloc
+import subprocess
+import contextlib
+from datetime import datetime
+from collections import Counter
+
+os.environ.setdefault("PLOT_HEADLESS", "1") # before analysis_draw imports pyplot
+os.environ.setdefault("PLOT_CACHE", "0")    # every run renders, the timings are the point
+
+import analysis
+import analysis_draw
+from analysis import Get_DataList, Get_TimestampRange, Get_AbnormalNodeRuns, Get_ActiveInstanceNumber, Get_Allocation, \
+    Get_Uptimes, Get_Uptime_Groups, Get_Performance_Variance, Get_Startup_Phases, Get_Node_Throughput, Get_Miner_Events, \
+    Get_Top10_GPU_Types, Get_Top10_Countries, \
+    TIMESTAMP_START, TIME_INTERVAL_1MIN, TIME_INTERVAL_1HOUR, TIME_INTERVAL_1DAY
+from analysis_draw import Plot_Node_Run_to_Request_Ratio, Plot_Allocation, Plot_Uptime_Distribution, Plot_Performance_Single, \
+    Plot_Performance_Variance, Plot_Node_Throughput, Plot_Startup_Phases
+from rollup import Build_Rollup
+from anomaly import Get_Anomaly_Intervals
+from gaps import Get_Gaps
+from synthetic import Generate_Fleet
+
+
+# Benchmark suite for the analysis pipeline: for each fleet size, generate a synthetic fleet (synthetic.py),
+# then time each analysis and plotting function on it and record the wall time and the peak memory
+# The results are appended to BENCHMARK_RESULTS, one row per function and fleet size, labeled with the
+# git commit, so runs before and after a change can be compared
+BENCHMARK_SIZES    = [ int(x) for x in os.getenv("BENCHMARK_SIZES", "100,1000,10000").split(",") ]  # node runs
+BENCHMARK_DAYS     = float(os.getenv("BENCHMARK_DAYS", 2))
+BENCHMARK_CHURN    = float(os.getenv("BENCHMARK_CHURN", 5))     # node runs per replica per day
+BENCHMARK_INTERVAL = int(os.getenv("BENCHMARK_INTERVAL", 10))   # minutes, the time step of the active instance series
+BENCHMARK_PLOTS    = os.getenv("BENCHMARK_PLOTS", "1") == "1"
+BENCHMARK_MEMORY   = os.getenv("BENCHMARK_MEMORY", "1") == "1"  # a second, traced run per function for the peak memory
+BENCHMARK_FOLDER   = os.getenv("BENCHMARK_FOLDER", "data_benchmark")
+BENCHMARK_OUTPUT   = os.getenv("BENCHMARK_OUTPUT", "output_benchmark")
+BENCHMARK_RESULTS  = os.getenv("BENCHMARK_RESULTS", "output/benchmark_results.csv")
+BENCHMARK_LABEL    = os.getenv("BENCHMARK_LABEL", "")           # defaults to the git commit
+
+
+def Get_Label():
+    if BENCHMARK_LABEL:
+        return BENCHMARK_LABEL
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Call fn quietly; returns (result, wall time s, peak traced memory MB or None)
+def Measure(fn, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        t = time.perf_counter()
+        result = fn(*args)
+        wall = time.perf_counter() - t
+
+        peak = None
+        if BENCHMARK_MEMORY:
+            tracemalloc.start()
+            fn(*args)
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+    return result, wall, peak
+
+
+# The functions to time on a loaded fleet, as (name, fn, args)
+def Get_Cases(data_list):
+    start, end = TIMESTAMP_START, TIMESTAMP_START + TIME_INTERVAL_1DAY * BENCHMARK_DAYS
+    interval = TIME_INTERVAL_1MIN * BENCHMARK_INTERVAL
+    gpu_type = Counter(node_run['gpu_type'] for node_run in data_list).most_common(1)[0][0]
+    longest = max(data_list, key=lambda node_run: len(node_run.get('history', ())))
+
+    cases = [ ("Get_TimestampRange",       Get_TimestampRange,       (data_list,)),
+              ("Get_AbnormalNodeRuns",     Get_AbnormalNodeRuns,     (data_list,)),
+              ("Get_ActiveInstanceNumber", Get_ActiveInstanceNumber, (data_list, start, end, interval)),
+              ("Get_Allocation",           Get_Allocation,           (data_list, start, end, TIME_INTERVAL_1HOUR)),
+              ("Get_Uptimes",              Get_Uptimes,              (data_list, start, end, 'all', 'all')),
+              ("Get_Uptime_Groups",        Get_Uptime_Groups,        (data_list, start, end)),
+              ("Get_Performance_Variance", Get_Performance_Variance, (data_list, gpu_type)),
+              ("Get_Startup_Phases",       Get_Startup_Phases,       (data_list,)),
+              ("Get_Node_Throughput",      Get_Node_Throughput,      (data_list,)),
+              ("Get_Miner_Events",         Get_Miner_Events,         (data_list,)),
+              ("Get_Top10_GPU_Types",      Get_Top10_GPU_Types,      (data_list,)),
+              ("Get_Top10_Countries",      Get_Top10_Countries,      (data_list,)),
+              ("Build_Rollup",             Build_Rollup,             (data_list,)),
+              ("Get_Anomaly_Intervals",    Get_Anomaly_Intervals,    (data_list,)),
+              ("Get_Gaps",                 Get_Gaps,                 (data_list,)) ]
+
+    if BENCHMARK_PLOTS:
+        cases += [ ("Plot_Node_Run_to_Request_Ratio", Plot_Node_Run_to_Request_Ratio, (start, end, "Benchmark", f"{BENCHMARK_OUTPUT}/run_to_request_ratio.png")),
+                   ("Plot_Allocation",                Plot_Allocation,                (start, end, TIME_INTERVAL_1HOUR, "Benchmark", f"{BENCHMARK_OUTPUT}/allocation.png")),
+                   ("Plot_Uptime_Distribution",       Plot_Uptime_Distribution,       (start, end, 'all', 'all', "Benchmark", f"{BENCHMARK_OUTPUT}/uptime_distribution.png")),
+                   ("Plot_Performance_Variance",      Plot_Performance_Variance,      (gpu_type, f"{BENCHMARK_OUTPUT}/performance_variance.png")),
+                   ("Plot_Node_Throughput",           Plot_Node_Throughput,           (f"{BENCHMARK_OUTPUT}/node_throughput.png",)),
+                   ("Plot_Startup_Phases",            Plot_Startup_Phases,            (f"{BENCHMARK_OUTPUT}/startup_phases.png",)) ]
+        if longest.get('history'):  # not loaded with DATA_HISTORY=none
+            cases += [ ("Plot_Performance_Single", Plot_Performance_Single, (longest['history'], "performance_single", BENCHMARK_OUTPUT, {},
+                                                                             longest.get('history_column', analysis.HISTORY_COLUMN))) ]
+    return cases
+
+
+def Run_Benchmark(sizes=BENCHMARK_SIZES):
+    label, run = Get_Label(), datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    os.makedirs(BENCHMARK_OUTPUT, exist_ok=True)
+    os.makedirs(os.path.dirname(BENCHMARK_RESULTS) or ".", exist_ok=True)
+    new_file = not os.path.exists(BENCHMARK_RESULTS)
+    results = []
+
+    for size in sizes:
+        # A fresh fleet of about size node runs
+        folder = os.path.join(BENCHMARK_FOLDER, str(size))
+        shutil.rmtree(folder, ignore_errors=True)
+        replicas = max(1, round(size / (BENCHMARK_DAYS * BENCHMARK_CHURN)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            Generate_Fleet(folder, replicas, BENCHMARK_DAYS, BENCHMARK_CHURN)
+
+        data_list, wall, peak = Measure(Get_DataList, folder)
+        rows = sum(len(node_run.get('history', ())) for node_run in data_list)
+        print(f"----> {len(data_list)} node runs, {rows} history rows", flush=True)
+        cases = [ ("Get_DataList", None, None) ] + Get_Cases(data_list)
+
+        analysis_draw.DATA_LIST = data_list  # the plotters read the module-level data list
+        for name, fn, args in cases:
+            if fn is not None:
+                _, wall, peak = Measure(fn, *args)
+            print(f"{name:<32} {wall:10.3f}s" + ("" if peak is None else f" {peak:10.1f}MB"), flush=True)
+            results.append( [run, label, name, len(data_list), rows, round(wall, 4), "" if peak is None else round(peak, 2)] )
+
+    with open(BENCHMARK_RESULTS, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["run", "label", "function", "node_runs", "history_rows", "wall_s", "peak_MB"])
+        writer.writerows(results)
+    print(f"----> Results appended to {BENCHMARK_RESULTS}")
+
+    return results
+
+
+if __name__ == "__main__":
+
+    Run_Benchmark()
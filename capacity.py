@@ -0,0 +1,152 @@
+import os
+import numpy as np
+
+from profiling import Instrument
+from analysis import Get_Uptime_Groups, \
+    Get_TimestampRange, \
+    Parse_Epoch, \
+    DATA_LIST
+
+
+# Monte Carlo capacity simulator: how many replicas to request for a target number of running instances
+# The model of a GPU class is fitted from the measured node runs (Get_Capacity_Model):
+#   uptimes - the uptimes of the stopped node runs (the running ones have not been interrupted yet)
+#   delays  - the reallocation delays, each stop matched first in, first out to the next allocation of the class;
+#             the test group took any GPU, so a class alone waits longer than the whole fleet, as a group limited to it would
+# Each replica cycles through a delay (waiting for a node, also at the start) and an uptime, drawn from the measured
+# values; thousands of fleets of N replicas are simulated at once as (fleets, replicas, cycles) arrays, and the
+# running count of every fleet on a time grid is the cumulative sum of its onsets less its interruptions
+CAPACITY_FLEETS       = int(os.getenv("CAPACITY_FLEETS", 1000))          # fleets simulated per replica count
+CAPACITY_HORIZON_H    = float(os.getenv("CAPACITY_HORIZON_H", 72))       # hours simulated
+CAPACITY_WARMUP_H     = float(os.getenv("CAPACITY_WARMUP_H", 12))        # hours left out of the steady state ratios
+CAPACITY_STEP_S       = int(os.getenv("CAPACITY_STEP_S", 60))            # seconds, the time grid
+CAPACITY_TARGET       = int(os.getenv("CAPACITY_TARGET", 95))            # running instances wanted ...
+CAPACITY_AVAILABILITY = float(os.getenv("CAPACITY_AVAILABILITY", 0.99))  # ... this share of the (steady state) time
+CAPACITY_SEED         = int(os.getenv("CAPACITY_SEED", 0))               # the same random draws for every replica count
+CAPACITY_QUANTILES    = ( 0.01, 0.05, 0.5, 0.95, 0.99 )
+
+
+# Match the stops to the allocations after them, first in, first out; returns the delays in seconds
+def Get_Reallocation_Delays(stops, onlines):
+    delays = []
+    j = 0
+    for stop in sorted(stops):
+        while j < len(onlines) and onlines[j] <= stop:
+            j += 1
+        if j == len(onlines):
+            break
+        delays.append(onlines[j] - stop)
+        j += 1
+    return delays
+
+
+# Fit the model of each GPU class ("high", "mid", "low", "none", and "all") from the uptime groups
+# Returns {gpu_class: {'uptimes', 'delays' (arrays, seconds), 'runs'}}, only for the classes with a stop and a reallocation
+def Get_Capacity_Model(data_list):
+    start, end = Get_TimestampRange(data_list)
+    groups = Get_Uptime_Groups(data_list, start, end, partitions=('state', 'gpu_class'))
+    capacity_model = {}
+
+    for (state, gpu_class), group in groups.items():
+        if state != "all" or ("stopped", gpu_class) not in groups:
+            continue
+        stopped = groups[("stopped", gpu_class)]['uptimes']
+        onlines = sorted(Parse_Epoch(online) for _, online, _ in group['uptimes'])
+        delays = Get_Reallocation_Delays([ Parse_Epoch(last_update) for _, _, last_update in stopped ], onlines)
+        if not delays:
+            continue
+        capacity_model[gpu_class] = { 'uptimes': np.array([ u for u, _, _ in stopped ], dtype=np.float64),
+                                      'delays':  np.array(delays, dtype=np.float64),
+                                      'runs':    group['count'] }
+
+    for gpu_class, model in sorted(capacity_model.items()):
+        print(f"{gpu_class}: {model['runs']} node runs, {len(model['uptimes'])} stops, mean uptime {model['uptimes'].mean()/3600:.2f}h, "
+              f"mean reallocation delay {model['delays'].mean()/60:.1f}min")
+    return capacity_model
+
+
+# The running instances of each simulated fleet of replicas on the time grid: (fleets, steps) array
+def Simulate_Fleets(model, replicas, fleets=CAPACITY_FLEETS, horizon_h=CAPACITY_HORIZON_H, step_s=CAPACITY_STEP_S, seed=CAPACITY_SEED):
+    rng = np.random.default_rng(seed)
+    horizon, steps = horizon_h * 3600, int(horizon_h * 3600 // step_s)
+    cycle = model['uptimes'].mean() + model['delays'].mean()
+    cycles = int(horizon / max(cycle, step_s) * 2) + 4
+
+    # Draw more cycles until every replica runs past the horizon
+    while True:
+        delays = rng.choice(model['delays'], (fleets, replicas, cycles))
+        uptimes = rng.choice(model['uptimes'], (fleets, replicas, cycles))
+        stops = np.cumsum(delays + uptimes, axis=2)
+        if stops[:, :, -1].min() >= horizon:
+            break
+        cycles *= 2
+    onsets = stops - uptimes
+
+    # Running at step t: onset <= t * step_s < stop
+    fleet = np.broadcast_to(np.arange(fleets)[:, None, None], stops.shape)
+    def count(times):
+        steps_at = np.ceil(times / step_s).astype(np.int64)
+        inside = steps_at < steps
+        return np.bincount(fleet[inside] * steps + steps_at[inside], minlength=fleets * steps)
+    return np.cumsum((count(onsets) - count(stops)).reshape(fleets, steps), axis=1)
+
+
+# Simulate fleets of replicas against a target number of running instances
+# Returns {'replicas', 'availability' (share of the steady state time with target running), 'ratio' ({quantile:
+# run-to-request ratio} over the steady state time of every fleet), 'time_to_capacity_h' ({quantile: hours until
+# target first runs}, inf if never within the horizon)}
+def Get_Capacity(model, replicas, target=CAPACITY_TARGET, fleets=CAPACITY_FLEETS, horizon_h=CAPACITY_HORIZON_H,
+                 warmup_h=CAPACITY_WARMUP_H, step_s=CAPACITY_STEP_S, seed=CAPACITY_SEED):
+    running = Simulate_Fleets(model, replicas, fleets, horizon_h, step_s, seed)
+    steady = running[:, int(warmup_h * 3600 // step_s):]
+
+    reached = running >= target
+    first = np.where(reached.any(axis=1), reached.argmax(axis=1) * step_s / 3600, np.inf)
+    return { 'replicas':           replicas,
+             'availability':       float((steady >= target).mean()),
+             'ratio':              dict(zip(CAPACITY_QUANTILES, np.quantile(steady / replicas, CAPACITY_QUANTILES))),
+             'time_to_capacity_h': dict(zip(CAPACITY_QUANTILES, np.quantile(first, CAPACITY_QUANTILES, method='inverted_cdf'))) }
+
+
+# The fewest replicas with target running for the availability share of the time: doubling the surplus over the
+# target until a count is enough, then bisecting; every count is simulated with the same seed, so the runs compare
+# Returns the Get_Capacity result of that count, or of the largest count tried (max_replicas) if none is enough
+def Get_Capacity_Replicas(model, target=CAPACITY_TARGET, availability=CAPACITY_AVAILABILITY, max_replicas=None, **kwargs):
+    max_replicas = max_replicas or 10 * target
+    low, surplus = target - 1, 1
+    while True:
+        high = min(target + surplus, max_replicas)
+        result = Get_Capacity(model, high, target, **kwargs)
+        if result['availability'] >= availability or high == max_replicas:
+            break
+        low, surplus = high, surplus * 2
+    if result['availability'] < availability:
+        return result
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        temp = Get_Capacity(model, middle, target, **kwargs)
+        if temp['availability'] >= availability:
+            high, result = middle, temp
+        else:
+            low = middle
+    return result
+
+
+Instrument(globals())
+
+
+if __name__ == "__main__":
+
+    print("----> Capacity model per GPU class (fitted from the measured uptimes and reallocations):")
+    capacity_model = Get_Capacity_Model(DATA_LIST)
+
+    print(f"----> Replicas for {CAPACITY_TARGET} running {CAPACITY_AVAILABILITY*100:g}% of the time, "
+          f"{CAPACITY_FLEETS} fleets over {CAPACITY_HORIZON_H:g}h (first {CAPACITY_WARMUP_H:g}h left out):")
+    for gpu_class, model in sorted(capacity_model.items()):
+        result = Get_Capacity_Replicas(model)
+        ratio = ", ".join(f"p{q*100:g} {x:.3f}" for q, x in result['ratio'].items())
+        ttc = ", ".join(f"p{q*100:g} {x:.2f}h" for q, x in result['time_to_capacity_h'].items())
+        print(f"{gpu_class}: {result['replicas']} replicas, availability {result['availability']*100:.2f}%")
+        print(f"    run-to-request ratio: {ratio}")
+        print(f"    time to capacity: {ttc}")
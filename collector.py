@@ -0,0 +1,228 @@
+import os
+import json
+import gzip
+import time
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import boto3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AWS_ACCESS_KEY_ID      = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_ACCESS_KEY  = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_ENDPOINT_URL       = os.getenv("AWS_ENDPOINT_URL")
+AWS_REGION             = os.getenv("AWS_REGION")
+
+BUCKET     = os.getenv("BUCKET")  # empty keeps the segments local only
+PREFIX     = os.getenv("PREFIX","")
+FOLDER     = os.getenv("FOLDER")
+
+# Fleet collector: agents push their history rows every metric interval, and the report header on report ticks
+# (COLLECTOR_URL on the agent), instead of or in addition to writing one object per node run to the bucket
+#   POST /push    - {"run": "<online>_<machine id>", "rows": ["0,2025-09-22 00:02:05,...", ...], "header": {...}}
+#   GET  /status  - the node runs seen, with the time of their last push (heartbeat) and row count
+# Store, append-only and partitioned by the UTC hour of arrival:
+#   COLLECTOR_STORE/2025-09-22/00.jsonl     - an open partition, one pushed record per line, appended in batches
+#   COLLECTOR_STORE/2025-09-21/23.jsonl.gz  - a compacted segment of a closed hour, one line per node run
+#                                             {"run", "header" (the latest), "rows" (deduplicated, in order)}
+#   COLLECTOR_STORE/manifest.json           - the segments uploaded to BUCKET, under PREFIX/COLLECTOR_FOLDER
+# analysis.py reads a store, or a folder of downloaded segments, with DATA_COLLECTOR=<folder>
+COLLECTOR_PORT           = int(os.getenv("COLLECTOR_PORT", 8000))
+COLLECTOR_STORE          = os.getenv("COLLECTOR_STORE", "collector_store")
+COLLECTOR_TOKEN          = os.getenv("COLLECTOR_TOKEN", "")                  # empty accepts any agent
+COLLECTOR_FOLDER         = os.getenv("COLLECTOR_FOLDER", f"{FOLDER}_collector")
+COLLECTOR_BATCH_INTERVAL = int(os.getenv("COLLECTOR_BATCH_INTERVAL", 5))    # 5 seconds, buffered records are appended to the store
+COLLECTOR_FLUSH_INTERVAL = int(os.getenv("COLLECTOR_FLUSH_INTERVAL", 300))  # 300 seconds, closed hours are compacted and uploaded
+
+BUFFER      = []               # pushed records, waiting for the next batch
+BUFFER_LOCK = threading.Lock()
+STORE_LOCK  = threading.Lock() # the writer and the compaction
+RUNS        = {}               # run: {'last_seen', 'rows'}, for /status
+
+
+def Partition_Path(epoch):
+    t = datetime.fromtimestamp(epoch, timezone.utc)
+    return os.path.join(COLLECTOR_STORE, t.strftime("%Y-%m-%d"), t.strftime("%H") + ".jsonl")
+
+
+# Append the buffered records to their hour partitions
+def Write_Batch():
+    with BUFFER_LOCK:
+        records = BUFFER[:]
+        BUFFER.clear()
+    if not records:
+        return 0
+
+    partitions = {}
+    for record in records:
+        partitions.setdefault(Partition_Path(record['t']), []).append(record)
+    with STORE_LOCK:
+        for path, batch in partitions.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in batch))
+    return len(records)
+
+
+# Merge the records of a closed partition into one line per node run, and replace it with a gzip segment
+def Compact_Partition(path):
+    runs = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            run = runs.setdefault(record['run'], { 'run': record['run'], 'header': None, 'rows': {} })
+            if record.get('header'):
+                run['header'] = record['header']
+            for row in record.get('rows', []):
+                run['rows'].setdefault(int(row.split(",", 1)[0]), row)  # rows are resent after a failed push
+
+    segment = path + ".gz"
+    with gzip.open(segment + ".tmp", "wt", encoding="utf-8") as f:
+        for run in runs.values():
+            run['rows'] = [ run['rows'][no] for no in sorted(run['rows']) ]
+            f.write(json.dumps(run) + "\n")
+    os.replace(segment + ".tmp", segment)
+    os.remove(path)
+    return segment
+
+
+def Read_Manifest():
+    try:
+        with open(os.path.join(COLLECTOR_STORE, "manifest.json"), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def Write_Manifest(manifest):
+    path = os.path.join(COLLECTOR_STORE, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# Compact the hours closed for at least two batch intervals, then upload the segments not yet in the manifest
+def Flush(s3_client=None):
+    closed_before = Partition_Path(time.time() - 2 * COLLECTOR_BATCH_INTERVAL)  # the paths sort by time
+    with STORE_LOCK:
+        for root, _, files in os.walk(COLLECTOR_STORE):
+            for filename in files:
+                path = os.path.join(root, filename)
+                if filename.endswith(".jsonl") and path < closed_before:
+                    Compact_Partition(path)
+    segments = sorted(os.path.join(root, filename) for root, _, files in os.walk(COLLECTOR_STORE)
+                      for filename in files if filename.endswith(".jsonl.gz"))
+
+    if s3_client is None:
+        return segments
+    manifest = Read_Manifest()
+    for path in segments:
+        name = os.path.relpath(path, COLLECTOR_STORE).replace(os.sep, "/")
+        if name in manifest:
+            continue
+        key = (PREFIX + "/" if PREFIX else "") + COLLECTOR_FOLDER + "/" + name
+        try:
+            s3_client.upload_file(path, BUCKET, key)
+        except Exception as e:
+            print(f"\n---------> Collector Flush Thread: failed to upload {name} - {e}", flush=True)
+            continue
+        manifest.append(name)
+        Write_Manifest(manifest)
+        print(f"\n---------> Collector Flush Thread: uploaded {name} to {BUCKET}/{key}", flush=True)
+    return segments
+
+
+def Writer():
+    def loop():
+        while True:
+            time.sleep(COLLECTOR_BATCH_INTERVAL)
+            Write_Batch()
+    threading.Thread(target=loop, daemon=True).start()
+
+
+def Flusher():
+    s3_client = None
+    if BUCKET:
+        s3_client = boto3.client(
+            "s3",
+            endpoint_url=AWS_ENDPOINT_URL,
+            aws_access_key_id=AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+            region_name=AWS_REGION
+        )
+    def loop():
+        while True:
+            time.sleep(COLLECTOR_FLUSH_INTERVAL)
+            Flush(s3_client)
+    threading.Thread(target=loop, daemon=True).start()
+    return s3_client
+
+
+def Start_Collector_Server(port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/push":
+                self.reply(404, {"error": "not found"})
+                return
+            if COLLECTOR_TOKEN and self.headers.get("Authorization") != f"Bearer {COLLECTOR_TOKEN}":
+                self.reply(401, {"error": "unauthorized"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                run, rows, header = body['run'], body.get('rows', []), body.get('header')
+                if not isinstance(run, str) or not isinstance(rows, list) or not (header is None or isinstance(header, dict)):
+                    raise ValueError("run must be a string, rows a list and header an object")
+            except (ValueError, KeyError, TypeError) as e:
+                self.reply(400, {"error": str(e)})
+                return
+
+            now = time.time()
+            record = { 't': now, 'run': run, 'rows': rows } | ({ 'header': header } if header else {})
+            with BUFFER_LOCK:
+                BUFFER.append(record)
+                seen = RUNS.setdefault(run, { 'last_seen': now, 'rows': 0 })
+                seen['last_seen'] = now
+                seen['rows'] += len(rows)
+            self.reply(200, {"ok": True})
+
+        def do_GET(self):
+            if self.path != "/status":
+                self.reply(404, {"error": "not found"})
+                return
+            now = time.time()
+            with BUFFER_LOCK:
+                runs = { run: { 'last_seen_s_ago': round(now - x['last_seen'], 1), 'rows': x['rows'] } for run, x in RUNS.items() }
+                buffered = len(BUFFER)
+            self.reply(200, { 'runs': runs, 'buffered_records': buffered })
+
+        def reply(self, code, body):
+            body = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args): # One line per push would flood the output
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+
+    os.makedirs(COLLECTOR_STORE, exist_ok=True)
+    s3_client = Flusher()
+    Flush(s3_client) # partitions left over from a previous run
+    Writer()
+    server = Start_Collector_Server(COLLECTOR_PORT)
+    print(f"----> Collector listening on port {COLLECTOR_PORT}, store: {COLLECTOR_STORE}, bucket: {BUCKET or 'none'}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        Write_Batch()
+        print(f"----> Collector stopped, {len(RUNS)} node runs seen", flush=True)
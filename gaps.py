@@ -0,0 +1,117 @@
+from collections import Counter
+import numpy as np
+
+from profiling import Instrument
+from analysis import Get_History_Columns, \
+    DATA_LIST
+
+
+# Gap and interruption timeline of every node run, from its 'no' and timestamp history columns
+# A node run is otherwise one continuous interval from online to last_update; between two consecutive rows:
+#   Missed Ticks - 'no' skips rows (full history retention only; ring/tiered retention drop rows on purpose)
+#   Stall        - more time passed than the ticks account for: a container freeze, an overloaded node or a clock jump forward
+#   Resumption   - rows closer together than a tick, the scheduler catching up on the missed ticks after a stall
+#   Clock Jump   - the timestamp went backwards
+# The rows of a batch of node runs are concatenated into flat arrays and every step is classified at once
+GAP_FACTOR = 1.5   # a step is off when it is more than 1.5x, or less than 1/1.5 of, the expected ticks
+GAP_BATCH  = 1024  # node runs per batch, bounds the memory of the flat arrays
+GAP_KINDS  = [ 'Missed Ticks', 'Stall', 'Resumption', 'Clock Jump' ]
+
+
+# The rows of a batch of node runs as flat arrays: 'no', timestamp (epoch seconds), the run index and metric interval
+def Get_Gap_Arrays(node_runs):
+    nos, timestamps, runs, intervals, full = [], [], [], [], []
+    for i, node_run in enumerate(node_runs):
+        no, timestamp = Get_History_Columns(node_run, ['no', 'timestamp'])
+        nos.append(np.asarray(no, dtype=np.int64))
+        timestamps.append(np.asarray(timestamp, dtype=np.int64))
+        runs.append(np.full(len(no), i, dtype=np.int32))
+        intervals.append(node_run.get('metric_interval_s', 60))
+        full.append(node_run.get('history_retention', "full") == "full")
+    return np.concatenate(nos), np.concatenate(timestamps), np.concatenate(runs), np.array(intervals), np.array(full)
+
+
+# Classify the step into each row from the previous row of the same run: an index into GAP_KINDS, or -1
+def Classify_Steps(no, timestamp, run, intervals, full):
+    kinds = np.full(len(no), -1, dtype=np.int8)
+    same = np.concatenate([[False], run[1:] == run[:-1]])
+    d_no = np.concatenate([[1], np.diff(no)])
+    d_t = np.concatenate([[0], np.diff(timestamp)])
+    expected = np.maximum(d_no, 1) * intervals[run]
+
+    # Later kinds win where several apply, e.g. a stall over missed ticks
+    kinds[same & (d_no > 1) & full[run]] = 0
+    kinds[same & (d_t > GAP_FACTOR * expected)] = 1
+    kinds[same & (d_t >= 0) & (d_t < expected / GAP_FACTOR)] = 2
+    kinds[same & (d_t < 0)] = 3
+    return kinds, d_no, d_t, expected
+
+
+# Runs of consecutive steps of the same kind in the same node run: (kind, first step, last step)
+def Get_Step_Intervals(kinds, run):
+    breaks = np.nonzero((kinds[1:] != kinds[:-1]) | (run[1:] != run[:-1]))[0] + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks - 1, [len(kinds) - 1]])
+    flagged = kinds[starts] >= 0
+    return kinds[starts[flagged]], starts[flagged], ends[flagged]
+
+
+# Detect the gaps of every node run
+# Returns [(kind, run index, first no, last no, start epoch, end epoch, seconds)], where the interval runs from the row
+# before the first off step to the row after the last, and seconds is the time the ticks do not account for (Stall),
+# the ticks missing (Missed Ticks), or the time the clock or the catch-up took back (Resumption, Clock Jump)
+def Get_Gaps(data_list, batch=GAP_BATCH):
+    gaps = []
+    indices = [ i for i, node_run in enumerate(data_list) if len(node_run.get('history', [])) >= 2 ]
+
+    for b in range(0, len(indices), batch):
+        batch_indices = indices[b:b + batch]
+        no, timestamp, run, intervals, full = Get_Gap_Arrays([ data_list[i] for i in batch_indices ])
+        kinds, d_no, d_t, expected = Classify_Steps(no, timestamp, run, intervals, full)
+        off = np.where(kinds == 0, (d_no - 1) * intervals[run], np.abs(d_t - expected))
+        cumulative = np.concatenate([[0], np.cumsum(off)])
+
+        for kind, first, last in zip(*Get_Step_Intervals(kinds, run)):
+            gaps.append( (GAP_KINDS[kind], batch_indices[run[first]], int(no[first - 1]), int(no[last]),
+                          int(timestamp[first - 1]), int(timestamp[last]), int(cumulative[last + 1] - cumulative[first])) )
+    return gaps
+
+
+# Screen every node run for gaps
+# Returns [(kind, online, first no, last no, seconds)], one per gap interval
+def Get_Gap_Intervals(data_list):
+    gap_intervals = [ (kind, data_list[i]['online'], first, last, seconds) for kind, i, first, last, _, _, seconds in Get_Gaps(data_list) ]
+
+    counts = Counter(kind for kind, _, _, _, _ in gap_intervals)
+    print(f"Gap intervals: {len(gap_intervals)} in {len(set(x[1] for x in gap_intervals))} node runs")
+    for kind, count in counts.most_common():
+        seconds = sum(x[4] for x in gap_intervals if x[0] == kind)
+        print(f"{kind}: {count}, {seconds / 60:.1f} minutes")
+
+    return gap_intervals
+
+
+# Set the covered time of every node run, for the covered-only figures (covered=True in Get_ActiveInstanceNumber,
+# Get_Uptimes and Get_Uptime_Groups): node_run['uncovered'], the [(start, end)] epoch spans of its stalls not
+# accounted for by ticks, and node_run['covered_s'], its uptime less those spans
+def Set_Coverage(data_list):
+    for node_run in data_list:
+        node_run['uncovered'] = []
+    for kind, i, _, _, start, end, seconds in Get_Gaps(data_list):
+        if kind == 'Stall':
+            data_list[i]['uncovered'].append( (end - seconds, end) )
+    for node_run in data_list:
+        node_run['covered_s'] = max(0, node_run['uptime_s'] - sum(end - start for start, end in node_run['uncovered']))
+
+    covered = sum(1 for node_run in data_list if node_run['uncovered'])
+    print(f"Node runs with uncovered time: {covered}, {sum(node_run['uptime_s'] - node_run['covered_s'] for node_run in data_list) / 60:.1f} minutes")
+
+
+Instrument(globals())
+
+
+if __name__ == "__main__":
+
+    print("----> Gap intervals (kind, online, first no, last no, seconds):")
+    for gap in Get_Gap_Intervals(DATA_LIST):
+        print(gap)
@@ -0,0 +1,105 @@
+import re
+import json
+import time
+import threading
+import collections
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local metrics endpoint on the agent, served from bounded in-memory ring buffers
+#   GET /metrics                                  - the latest values in the Prometheus text format
+#   GET /query?series=rows&start=&end=&columns=   - a JSON range query, start/end in epoch seconds (optional)
+# series: "rows" (one per metric interval) or "samples" (one per SAMPLE_INTERVAL, if enabled)
+# Bound to the loopback interface unless a host is given; with a token, requests need "Authorization: Bearer <token>"
+
+
+class Ring_Buffer:
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.rows = collections.deque(maxlen=size)  # (epoch seconds, {column: value})
+
+    def append(self, values, epoch=None):
+        with self.lock:
+            self.rows.append( (time.time() if epoch is None else epoch, values) )
+
+    def latest(self):
+        with self.lock:
+            return self.rows[-1] if self.rows else (None, {})
+
+    def range(self, start=None, end=None):
+        with self.lock:
+            return [ (t, v) for t, v in self.rows if (start is None or t >= start) and (end is None or t <= end) ]
+
+
+# Convert a history row into {column: value}, numbers where possible
+def Row_Values(history_column, value):
+    columns = [ column.strip() for column in history_column.split(',') ]
+    values = {}
+    for column, x in zip(columns, value.split(',')):
+        try:
+            values[column] = float(x)
+        except ValueError:
+            values[column] = x
+    return values
+
+
+# e.g. "gpu_vram_used_percent_%" -> "gpu_vram_used_percent_pct"
+def Metric_Name(prefix, column):
+    return prefix + re.sub(r'[^a-zA-Z0-9_]', '_', column.replace('%', 'pct')).strip('_')
+
+
+def Prometheus_Text(series, labels):
+    label_text = ",".join(f'{k}="{v}"' for k, v in labels().items())
+    lines = []
+    for prefix, buffer in series.items():
+        epoch, values = buffer.latest()
+        for column, x in values.items():
+            if isinstance(x, float):
+                name = Metric_Name(prefix, column)
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name}{{{label_text}}} {x} {int(epoch * 1000)}")
+    return "\n".join(lines) + "\n"
+
+
+# Serve the buffers in a background thread; labels() returns the labels of every metric, e.g. the machine ID
+def Start_Metrics_Server(port, rows, samples, labels, host="127.0.0.1", token=""):
+    series = { "salad_": rows, "salad_sample_": samples }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if token and self.headers.get("Authorization") != f"Bearer {token}":
+                self.reply(401, "text/plain", "unauthorized\n")
+                return
+            url = urlparse(self.path)
+            if url.path == "/metrics":
+                self.reply(200, "text/plain; version=0.0.4", Prometheus_Text(series, labels))
+            elif url.path == "/query":
+                query = parse_qs(url.query)
+                try:
+                    buffer  = rows if query.get("series", ["rows"])[0] == "rows" else samples
+                    start   = float(query["start"][0]) if "start" in query else None
+                    end     = float(query["end"][0]) if "end" in query else None
+                    columns = query["columns"][0].split(",") if "columns" in query else None
+                except ValueError as e:
+                    self.reply(400, "application/json", json.dumps({"error": str(e)}))
+                    return
+                result = [ {"epoch": t} | (v if columns is None else { c: v.get(c) for c in columns }) for t, v in buffer.range(start, end) ]
+                self.reply(200, "application/json", json.dumps(result))
+            else:
+                self.reply(404, "text/plain", "not found\n")
+
+        def reply(self, code, content_type, body):
+            body = body.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args): # Keep the agent output for the metric and uploader threads
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,4 +1,6 @@
 import os
+import re
+import json
 import time
 import psutil
 import subprocess
@@ -6,6 +8,7 @@ import sys
 import requests
 from pythonping import ping
 import speedtest
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import boto3
@@ -23,6 +26,21 @@ SALAD_MACHINE_ID =  os.getenv("SALAD_MACHINE_ID")
 g_DLSPEED        = int(os.getenv("DLSPEED", "50")) # Mbps
 g_ULSPEED        = int(os.getenv("ULSPEED", "20")) # Mbps
 g_RTT            = int(os.getenv("RTT","499"))     # ms
+g_NETWORK_DEADLINE = int(os.getenv("NETWORK_DEADLINE", "90")) # seconds, total time budget of the network test
+
+PING_TARGETS = [ 'ec2.us-west-1.amazonaws.com', 'ec2.us-east-2.amazonaws.com', 'ec2.eu-central-1.amazonaws.com' ]
+
+# Network probe cache, per machine: a passing network test is reused by the next containers on the same machine within
+# PROBE_CACHE_TTL, after a quick validation ping, instead of rerunning the speedtest and the full pings
+#   PROBE_CACHE="s3"     - BUCKET/PREFIX/probe_cache/<machine id>.json
+#   PROBE_CACHE=<folder> - <folder>/<machine id>.json, e.g. a volume shared by the containers on a machine
+#   PROBE_CACHE=""       - disabled (default)
+PROBE_CACHE       = os.getenv("PROBE_CACHE", "")
+PROBE_CACHE_TTL   = int(os.getenv("PROBE_CACHE_TTL") or 21600)  # 21600 seconds, 6 hours; empty is the default
+PROBE_PING_COUNT  = int(os.getenv("PROBE_PING_COUNT", 2))       # pings per target to validate a cached result
+PROBE_RTT_SLACK   = float(os.getenv("PROBE_RTT_SLACK", 1.5))    # the validation RTTs may be up to 1.5x the cached ones (+20 ms)
+BUCKET            = os.getenv("BUCKET")
+PREFIX            = os.getenv("PREFIX","")
 
 S3_CLIENT = boto3.client(
     "s3",
@@ -50,26 +68,138 @@ def network_test():
     return country, location, latency, dlspeed, ulspeed
 
 
-# Test network latency
+# Test network latency to one target
 # Only the root user can run this code - no issue in containers
+def ping_single(target, tCount):
+    try:
+        # Concurrent pings in one process share the ICMP identifier, so match the replies by a per-target payload
+        temp = ping(target, interval=1, count=tCount, verbose=False, payload=os.urandom(16), match=True)
+        return temp.rtt_avg_ms # average of successful pings only
+    except Exception as e:
+        return g_RTT
+
+
+# Test network latency to US West, US East and EU Central concurrently
 def ping_test(tCount=10):
     if tCount ==0:
         return g_RTT, g_RTT, g_RTT
-    try:
-        #print("To: ec2.us-west-1.amazonaws.com")
-        temp = ping('ec2.us-west-1.amazonaws.com', interval=1, count=tCount, verbose=False)
-        latency_uswest1 = temp.rtt_avg_ms # average of successful pings only     
-        #print("To: ec2.us-east-2.amazonaws.com")
-        temp = ping('ec2.us-east-2.amazonaws.com', interval=1, count=tCount, verbose=False)
-        latency_useast2 = temp.rtt_avg_ms # average of successful pings only     
-        #print("To: ec2.eu-central-1.amazonaws.com")  
-        temp = ping('ec2.eu-central-1.amazonaws.com', interval=1, count=tCount,verbose=False)
-        latency_eucentral1 = temp.rtt_avg_ms # average of successful pings only.
-    except Exception as e:  
-        return g_RTT, g_RTT, g_RTT
+    with ThreadPoolExecutor(max_workers=len(PING_TARGETS)) as executor:
+        latency_uswest1, latency_useast2, latency_eucentral1 = executor.map(lambda target: ping_single(target, tCount), PING_TARGETS)
     return latency_uswest1, latency_useast2, latency_eucentral1
 
 
+def Probe_Cache_Key():
+    return (PREFIX + "/" if PREFIX else "") + f"probe_cache/{SALAD_MACHINE_ID}.json"
+
+
+# The cached network test of this machine, {'measured_epoch', 'network'}, or None
+def Read_Probe_Cache():
+    try:
+        if PROBE_CACHE == "s3":
+            response = S3_CLIENT.get_object(Bucket=BUCKET, Key=Probe_Cache_Key())
+            return json.loads(response['Body'].read())
+        with open(os.path.join(PROBE_CACHE, f"{SALAD_MACHINE_ID}.json"), "r") as f:
+            return json.load(f)
+    except Exception as e: # no cached result yet, or the store is unreachable
+        return None
+
+
+def Write_Probe_Cache(network):
+    body = json.dumps({ 'measured_epoch': int(time.time()), 'network': network })
+    try:
+        if PROBE_CACHE == "s3":
+            S3_CLIENT.put_object(Bucket=BUCKET, Key=Probe_Cache_Key(), Body=body.encode("utf-8"))
+        else:
+            os.makedirs(PROBE_CACHE, exist_ok=True)
+            with open(os.path.join(PROBE_CACHE, f"{SALAD_MACHINE_ID}.json"), "w") as f:
+                f.write(body)
+    except Exception as e:
+        print(f"Failed to write the probe cache: {e}", flush=True)
+
+
+# Reuse a fresh, passing cached network test if a quick ping to each target is still in line with it
+# Returns the network fields with the new RTTs, or None to run the full test
+def Cached_Network_Check():
+    cached = Read_Probe_Cache()
+    if not cached or time.time() - cached['measured_epoch'] > PROBE_CACHE_TTL or not cached['network'].get('network_pass'):
+        return None
+
+    network = cached['network']
+    latencies = ping_test(PROBE_PING_COUNT)
+    for field, latency in zip(("rtt_to_us_west1_ms", "rtt_to_us_east2_ms", "rtt_to_eu_cent1_ms"), latencies):
+        if latency > g_RTT or latency > float(network[field]) * PROBE_RTT_SLACK + 20:
+            return None # the network changed, measure it again
+
+    return network | { "rtt_to_us_west1_ms": str(latencies[0]),
+                       "rtt_to_us_east2_ms": str(latencies[1]),
+                       "rtt_to_eu_cent1_ms": str(latencies[2]),
+                       "network_cached":     True,
+                       "network_measured_epoch": cached['measured_epoch'] }
+
+
+# Run the bandwidth test and the pings concurrently, within a total deadline
+# Probes still unfinished at the deadline fall back to the default network performance
+# With PROBE_CACHE, a recent passing result of the same machine is reused instead, see Cached_Network_Check
+def Network_Check(deadline=g_NETWORK_DEADLINE):
+    if SALAD_MACHINE_ID == "local": # Skip the network test if run locally
+        return {}
+
+    if PROBE_CACHE:
+        network = Cached_Network_Check()
+        if network is not None:
+            return network
+
+    executor = ThreadPoolExecutor(max_workers=1 + len(PING_TARGETS))
+    bandwidth = executor.submit(network_test)
+    pings = [ executor.submit(ping_single, target, 5) for target in PING_TARGETS ]
+    done, _ = wait([bandwidth] + pings, timeout=deadline)
+    executor.shutdown(wait=False, cancel_futures=True) # a stuck speedtest cannot be interrupted; let it finish in the background
+
+    if bandwidth in done:
+        country, location, latency, dlspeed, ulspeed = bandwidth.result()
+    else:
+        country, location, latency, dlspeed, ulspeed = "none", "none", g_RTT, g_DLSPEED, g_ULSPEED
+    latency_us_w, latency_us_e, latency_eu = [ temp.result() if temp in done else g_RTT for temp in pings ]
+
+    # Should reallocate if ping fails
+    Network_Pass = True
+    if ulspeed < g_ULSPEED or dlspeed < g_DLSPEED or latency_us_w > g_RTT or latency_us_e > g_RTT or latency_eu > g_RTT:
+        Network_Pass = False
+
+    network = { "country":            country,
+                "location":           location,
+                "rtt_ms":             str(latency),
+                "upload_Mbps":        str(ulspeed),
+                "download_Mbps":      str(dlspeed),
+                "rtt_to_us_west1_ms": str(latency_us_w),
+                "rtt_to_us_east2_ms": str(latency_us_e),
+                "rtt_to_eu_cent1_ms": str(latency_eu),
+                "network_pass":       Network_Pass
+              }
+    if PROBE_CACHE and Network_Pass and bandwidth in done:
+        Write_Probe_Cache(network)
+
+    return network | { "network_cached": False, "network_measured_epoch": int(time.time()) }
+
+
+# Placeholder network fields, reported until the asynchronous network test completes
+def Network_Pending():
+    if SALAD_MACHINE_ID == "local":
+        return {}
+    return { "country":            "pending",
+             "location":           "pending",
+             "rtt_ms":             "pending",
+             "upload_Mbps":        "pending",
+             "download_Mbps":      "pending",
+             "rtt_to_us_west1_ms": "pending",
+             "rtt_to_us_east2_ms": "pending",
+             "rtt_to_eu_cent1_ms": "pending",
+             "network_pass":       None,
+             "network_cached":     None,
+             "network_measured_epoch": None
+           }
+
+
 # Read the supported CUDA RT Version
 def Get_CUDA_Version():
     try:
@@ -83,16 +213,18 @@ def Get_CUDA_Version():
     return version 
 
 
-# Get the GPU info
-def Get_GPUs():
+# Get the info of every GPU on the node, in nvidia-smi index order
+def Get_GPUs_All():
     try:
-        cmd = ('nvidia-smi --query-gpu=gpu_name,memory.total,memory.used,memory.free,'
+        cmd = ('nvidia-smi --query-gpu=index,gpu_name,memory.total,memory.used,memory.free,'
                'utilization.memory,temperature.gpu,utilization.gpu --format=csv,noheader,nounits')
         output = subprocess.check_output(cmd, shell=True, text=True)
         lines = output.strip().split('\n')
+        result = []
         for line in lines: # 1 and 8 ( few 2 )
-            gpu_name, vram_total, vram_used, vram_free, mem_util, temp, gpu_util = line.strip().split(', ')
-            result = {
+            index, gpu_name, vram_total, vram_used, vram_free, mem_util, temp, gpu_util = line.strip().split(', ')
+            result.append({
+                'gpu_index': int(index),
                 'gpu_type': gpu_name,
                 'gpu_number': len(lines),
                 'gpu_vram_total_MiB': int(vram_total),
@@ -101,11 +233,63 @@ def Get_GPUs():
                 'gpu_utilization_%': int(gpu_util),
                 'gpu_temperature_C': int(temp),
                 'gpu_vram_utilization_%': int(mem_util) # VRAM <-> GPU Cache
-            }
-            break
+            })
         return result
     except Exception as e:
+        return []
+
+
+# Get the GPU info: the first GPU, plus the per-GPU info as 'gpus' on multi-GPU nodes
+def Get_GPUs():
+    gpus = Get_GPUs_All()
+    if not gpus:
         return {}
+    result = { k: v for k, v in gpus[0].items() if k != 'gpu_index' }
+    if len(gpus) > 1:
+        result['gpus'] = gpus
+    return result
+
+
+# Start nvidia-smi in loop mode, printing one line per GPU every interval_ms
+# A single long-lived process is far cheaper than forking nvidia-smi for every sample
+def Start_GPU_Sampler(interval_ms):
+    cmd = ['nvidia-smi', '--query-gpu=index,utilization.gpu,temperature.gpu,power.draw,clocks.sm',
+           '--format=csv,noheader,nounits', f'--loop-ms={int(interval_ms)}']
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+
+
+# Parse one line from the sampler, e.g. "0, 100, 72, 344.32, 1710"
+def Parse_GPU_Sample(line):
+    fields = [ x.strip() for x in line.strip().split(',') ]
+    if len(fields) != 5 or not fields[0].isdigit():
+        return None, {}
+    values = []
+    for x in fields[1:]:
+        try:
+            values.append(float(x))
+        except ValueError:
+            values.append(0.0)  # e.g. "[N/A]" on GPUs without power readings
+    return int(fields[0]), { 'gpu_utilization_%': values[0],
+                             'gpu_temperature_C': values[1],
+                             'power_watts':       values[2],
+                             'core_clock_MHz':    values[3] }
+
+
+# Events parsed from the lolMiner output, e.g. "GPU 0: Share accepted after 52ms"
+MINER_LOG_EVENTS = { 'accepted':   re.compile(r'share accepted|accepted share', re.IGNORECASE),
+                     'rejected':   re.compile(r'share rejected|rejected share|stale share', re.IGNORECASE),
+                     'reconnects': re.compile(r'reconnect|connection .*(lost|closed)|disconnected', re.IGNORECASE),
+                     'errors':     re.compile(r'\berror\b|exception|fatal', re.IGNORECASE) }
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+
+# Strip the color codes from a lolMiner output line, and classify it into one of MINER_LOG_EVENTS, or None
+def Parse_Miner_Log_Line(line):
+    line = ANSI_ESCAPE.sub('', line).rstrip()
+    for event, pattern in MINER_LOG_EVENTS.items():
+        if pattern.search(line):
+            return line, event
+    return line, None
 
 
 # Get the CPU info
@@ -136,7 +320,9 @@ def Get_CPUs():
 
 def System_Check(NETWORK_TEST=True):    
 
-    online_time = datetime.now(ZoneInfo("UTC")).strftime("%Y-%m-%d %H:%M:%S")
+    now = datetime.now(ZoneInfo("UTC"))
+    online_time = now.strftime("%Y-%m-%d %H:%M:%S")
+    online_epoch = int(now.timestamp()) # the same second as online_time, as an integer for the analysis
 
     # CUDA Version
     CUDA_version = Get_CUDA_Version()
@@ -154,33 +340,17 @@ def System_Check(NETWORK_TEST=True):
         Pass = False
 
     NETWORK = {}
-    Network_Pass = True
-    if SALAD_MACHINE_ID != "local" and NETWORK_TEST == True:       # Skip the initial checks if run locally    
-        # Network test: bandwidth
-        country, location, latency, dlspeed, ulspeed = network_test() 
-        #print(f"Networt: {country}, {location}, DL {dlspeed} Mbps, UL {ulspeed} Mbps")
-        # Network test: latency to some locations; should reallocate if ping fails
-        latency_us_w, latency_us_e, latency_eu = ping_test(tCount = 5) 
-        #print(f"Latency: to US West {latency_us_w} ms, to US East {latency_us_e} ms, to EU Central {latency_eu} ms")
-        if ulspeed < g_ULSPEED or dlspeed < g_DLSPEED or latency_us_w > g_RTT or latency_us_e > g_RTT or latency_eu > g_RTT:
-            Network_Pass = False
- 
-        NETWORK = { "country":            country,
-                    "location":           location,
-                    "rtt_ms":             str(latency),
-                    "upload_Mbps":        str(ulspeed),
-                    "download_Mbps":      str(dlspeed), 
-                    "rtt_to_us_west1_ms": str(latency_us_w),                        
-                    "rtt_to_us_east2_ms": str(latency_us_e),
-                    "rtt_to_eu_cent1_ms": str(latency_eu),
-                    "network_pass":       Network_Pass
-                 } 
-        
+    if NETWORK_TEST == True: # Network test: bandwidth and latency to some locations
+        NETWORK = Network_Check()
+        #print(f"Network: {NETWORK}")
+
     history_column = 'no, timestamp, gpu_vram_used_percent_%, gpu_vram_utilization_%, gpu_utilization_%, gpu_temperature_C, cpu_percent_%, cpu_ram_used_%'
     history_column = history_column + ', performance_sol_s, power_watts, core_temp_C, core_clock_MHz, accepted, rejected'
 
     environment= { "online":             online_time,           
                    "last_update":        online_time,   
+                   "online_epoch":       online_epoch,
+                   "last_update_epoch":  online_epoch,
                    "uptime_s":           0,    # placeholder, will be updated later
                    "no":                 0,    # placeholder, will be updated later
                    'metric_interval_s':  0,    # placeholder, will be updated later
@@ -0,0 +1,101 @@
+import json
+import time
+import calendar
+from array import array
+
+# Columnar history store for the agent: one typed array per column instead of one formatted string per row
+# Retention policies:
+#   "full"   - keep every row
+#   "ring"   - keep the last max_rows rows
+#   "tiered" - keep the last recent_rows rows as they are, and downsample older rows by tier_factor (one row per block),
+#              keeping at most max_rows downsampled rows
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+# How a block of older rows is reduced into one row when downsampling, by column name
+def Reduce_Function(column):
+    if column in ('no', 'timestamp', 'timestamp_epoch'):
+        return lambda x: x[0]                 # the start of the block
+    if column in ('accepted', 'rejected'):
+        return lambda x: x[-1]                # cumulative counters
+    if column == 'sample_count' or column.startswith('log_'):
+        return sum                            # per-interval counts
+    if column.endswith('_min'):
+        return min
+    if column.endswith('_max') or column.endswith('_p95'):
+        return max
+    return lambda x: round(sum(x) / len(x), 3)
+
+
+# Format a stored value as the agent formats it in the history rows, e.g. 6.0 -> "6", 0.1 -> "0.1"
+def Format_Value(x):
+    return str(int(x)) if x.is_integer() else repr(x)
+
+
+class History:
+    def __init__(self, history_column, retention="full", max_rows=10080, recent_rows=1440, tier_factor=10):
+        if retention not in ("full", "ring", "tiered"):
+            raise ValueError(f"Unknown history retention: {retention}")
+        self.columns     = [ column.strip() for column in history_column.split(',') ]
+        self.retention   = retention
+        self.max_rows    = max_rows
+        self.recent_rows = recent_rows
+        self.tier_factor = tier_factor
+        self.reduce      = [ Reduce_Function(column) for column in self.columns ]
+        self.recent      = self.new_store()
+        self.old         = self.new_store()  # downsampled rows, "tiered" only
+
+    def new_store(self):
+        # 'no' and the timestamps (epoch seconds) are integers, everything else is a double
+        return [ array('q') if column in ('no', 'timestamp', 'timestamp_epoch') else array('d') for column in self.columns ]
+
+    def __len__(self):
+        return len(self.old[0]) + len(self.recent[0])
+
+    # Append a history row, e.g. "0,2025-09-22 00:02:05,6,1,0,52,0.1,4.9,..."
+    def append(self, value):
+        fields = value.split(',')
+        for i, column in enumerate(self.columns):
+            if column == 'timestamp':
+                self.recent[i].append(calendar.timegm(time.strptime(fields[i], TIMESTAMP_FORMAT)))
+            elif column in ('no', 'timestamp_epoch'):
+                self.recent[i].append(int(fields[i]))
+            else:
+                try:
+                    self.recent[i].append(float(fields[i]))
+                except (ValueError, IndexError):
+                    self.recent[i].append(0.0)
+
+        if self.retention == "ring" and len(self.recent[0]) > self.max_rows:
+            for store in self.recent:
+                del store[0]
+        elif self.retention == "tiered" and len(self.recent[0]) >= self.recent_rows + self.tier_factor:
+            for i, store in enumerate(self.recent):
+                block = store[:self.tier_factor]
+                del store[:self.tier_factor]
+                self.old[i].append(self.reduce[i](block))
+            if len(self.old[0]) > self.max_rows:
+                for store in self.old:
+                    del store[0]
+
+    def rows(self):
+        for store in (self.old, self.recent):
+            for j in range(len(store[0])):
+                fields = []
+                for i, column in enumerate(self.columns):
+                    x = store[i][j]
+                    if column == 'timestamp':
+                        fields.append(time.strftime(TIMESTAMP_FORMAT, time.gmtime(x)))
+                    elif column in ('no', 'timestamp_epoch'):
+                        fields.append(str(x))
+                    else:
+                        fields.append(Format_Value(x))
+                yield ",".join(fields)
+
+    # Write the report in the upload format: the header fields, then the history rows streamed from the arrays
+    def write_json(self, f, header):
+        text = json.dumps(header, indent=2)
+        f.write(text[:-2] + ',\n  "history": [' if header else '{\n  "history": [')
+        for j, row in enumerate(self.rows()):
+            f.write(('\n    ' if j == 0 else ',\n    ') + json.dumps(row))
+        f.write('\n  ]\n}' if len(self) else ']\n}')
@@ -5,10 +5,16 @@ import threading
 import subprocess
 import queue
 import uuid
-import json
+import math
+import collections
+import logging
+import logging.handlers
+import psutil
 import requests
 from dotenv import load_dotenv
-from helper import System_Check, Uploader_Chunked_Parallel, Reallocate
+from history import History
+from exporter import Ring_Buffer, Row_Values, Start_Metrics_Server
+from helper import System_Check, Network_Check, Network_Pending, Uploader_Chunked_Parallel, Reallocate, Start_GPU_Sampler, Parse_GPU_Sample, MINER_LOG_EVENTS, Parse_Miner_Log_Line
 
 load_dotenv()
 
@@ -19,31 +25,100 @@ WALLET = os.environ.get("WALLET")
 BUCKET     = os.getenv("BUCKET")
 PREFIX     = os.getenv("PREFIX","")  # Can be empty 
 FOLDER     = os.getenv("FOLDER")
+KEY_LAYOUT = os.getenv("KEY_LAYOUT", "flat")  # "flat", "date" (FOLDER/2025-09-22/<file>) or "hour" (FOLDER/2025-09-22/00/<file>), by the online time
 
 METRIC_INTERVAL = int(os.getenv("METRIC_INTERVAL", 60)) # 60 seconds
 REPORT_NUMBER   = int(os.getenv("REPORT_NUMBER",    5))  # 5, report to cloud every 5 * 60 = 300 seconds
 
+# High-frequency sampling, reduced on the node into per-interval aggregates appended to each history row
+SAMPLE_INTERVAL = float(os.getenv("SAMPLE_INTERVAL") or 0)  # 0 or empty disables it; e.g. 0.5, sample the GPU and the miner every 0.5 seconds
+SAMPLE_FIELDS   = [ 'gpu_utilization_%', 'gpu_temperature_C', 'power_watts', 'core_clock_MHz', 'performance_sol_s' ]
+SAMPLE_STATS    = [ 'min', 'mean', 'max', 'p95' ]
+
+# The history store retention: "full", "ring" (the last HISTORY_MAX_ROWS rows), or "tiered" (the last HISTORY_RECENT_ROWS rows,
+# plus up to HISTORY_MAX_ROWS older rows downsampled by HISTORY_TIER_FACTOR), see history.py
+HISTORY_RETENTION   = os.getenv("HISTORY_RETENTION") or "full"
+HISTORY_MAX_ROWS    = int(os.getenv("HISTORY_MAX_ROWS") or 10080)    # 10080 rows, 1 week of metric intervals
+HISTORY_RECENT_ROWS = int(os.getenv("HISTORY_RECENT_ROWS") or 1440)  # 1440 rows, 1 day of metric intervals
+HISTORY_TIER_FACTOR = int(os.getenv("HISTORY_TIER_FACTOR") or 10)    # 10 older rows downsampled into 1
+
+# The local metrics endpoint (Prometheus text and JSON range queries), served from in-memory ring buffers
+METRICS_PORT   = int(os.getenv("METRICS_PORT") or 0)          # 0 or empty disables it; e.g. 9100
+METRICS_BUFFER = int(os.getenv("METRICS_BUFFER") or 1440)     # 1440 rows/samples kept per series, 1 day of metric intervals
+METRICS_HOST   = os.getenv("METRICS_HOST") or "127.0.0.1"     # the container only; 0.0.0.0 to publish the port, with METRICS_TOKEN
+METRICS_TOKEN  = os.getenv("METRICS_TOKEN", "")               # empty accepts any request
+
+# The fleet collector (collector.py): push every history row, with the report header on report ticks
+COLLECTOR_URL         = os.getenv("COLLECTOR_URL", "").rstrip("/")     # empty disables it; e.g. http://10.0.0.5:8000
+COLLECTOR_TOKEN       = os.getenv("COLLECTOR_TOKEN", "")
+COLLECTOR_MAX_PENDING = int(os.getenv("COLLECTOR_MAX_PENDING", 1440))  # 1440 rows kept while the collector is unreachable
+REPORT_SINK           = os.getenv("REPORT_SINK", "s3")                 # "s3", "collector" or "both"; the report file is always kept locally
+
 MAX_NO_RESPONSE_TIME     = METRIC_INTERVAL * REPORT_NUMBER * 2  # 600 seconds, no report for 10 minutes, then reallocate
 MAX_UPLOAD_FAILURE_COUNT = 2   # 2 consecutive report failures, then reallocate
 UPLOAD_CHECK_INTERVAL    = 5   # 5 seconds, check the upload queue every 5 seconds
 
-LOCAL_LOG_FILE = "miner_run.log"
-API_URL = "http://localhost:8080/"
+# The miner supervisor: restart lolMiner with exponential backoff whenever it exits
+MINER_BACKOFF_MIN     = int(os.getenv("MINER_BACKOFF_MIN", 5))       # 5 seconds, the first restart delay, doubled after each crash
+MINER_BACKOFF_MAX     = int(os.getenv("MINER_BACKOFF_MAX", 300))     # 300 seconds, the longest restart delay
+MINER_MIN_RUN_TIME    = int(os.getenv("MINER_MIN_RUN_TIME", 600))    # 600 seconds, a miner run shorter than this is a crash loop
+MINER_MAX_CRASH_LOOPS = int(os.getenv("MINER_MAX_CRASH_LOOPS", 5))   # 5 consecutive crash loops, then reallocate
+
+LOCAL_LOG_FILE    = "miner_run.log"
+MINER_LOG_MAX_MB  = int(os.getenv("MINER_LOG_MAX_MB", 10))  # 10 MB, rotate the miner log file beyond this size
+MINER_LOG_BACKUPS = int(os.getenv("MINER_LOG_BACKUPS", 2))  # keep 2 rotated files, so disk usage stays below 30 MB
+# "single": one miner, on the GPUs in CUDA_VISIBLE_DEVICES (all of them unless it is set); "per_gpu": one supervised miner per GPU, on API ports 8080, 8081, ...
+MINER_MODE = os.getenv("MINER_MODE", "single")
+API_PORT   = 8080
+API_URL    = f"http://localhost:{API_PORT}/"
+API_URLS   = [ API_URL ] # one per miner, set when the miners start
 # automatically optimizes LHR cards. Non-LHR GPUs ignore it safely.
 CMD_ZELHASH = [ "./lolMiner", "-a", "FLUX",    "--pool", "stratum+tcp://zelhash.auto.nicehash.com:9200","--user", WALLET, "--apiport", "8080","--lhrtune", "auto" ]
 #CMD_OCTOPUS = [ "./lolMiner", "-a", "OCTOPUS", "--pool", "stratum+tcp://octopus.auto.nicehash.com:9200","--user", WALLET, "--apiport", "8080" ]
 
 NO = 0 # of metric collections
 RESULT = {}
+HISTORY = None # the history rows of RESULT, in a columnar store
 START = time.perf_counter()
+# Startup phase timeline: seconds since the process was created, on the monotonic clock
+# The first offset covers the interpreter startup and imports, before START was taken
+PROCESS_START_OFFSET = max(0, time.time() - psutil.Process().create_time())
+PHASES = {}
+MINERS = [] # the state of each supervised miner
 GLOBAL_LOCK = threading.Lock()
-
-def get_mining_performance():
+# Miner log events: totals since start, and counts since the last metric task (the per-interval histogram)
+EVENTS          = collections.Counter()
+INTERVAL_EVENTS = collections.Counter()
+EVENTS_LOCK     = threading.Lock()
+MINER_LOG = logging.getLogger("miner")
+MINER_LOG.propagate = False
+MINER_LOG.addHandler(logging.handlers.RotatingFileHandler(LOCAL_LOG_FILE, maxBytes=MINER_LOG_MAX_MB * 1_000_000, backupCount=MINER_LOG_BACKUPS))
+MINER_LOG.setLevel(logging.INFO)
+# Recent history rows and samples for the metrics endpoint
+ROWS        = Ring_Buffer(METRICS_BUFFER)
+SAMPLE_ROWS = Ring_Buffer(METRICS_BUFFER)
+# Ring buffer between the sampler and the metric task, holding at most 2 metric intervals of samples
+SAMPLES = collections.deque(maxlen=int(2 * METRIC_INTERVAL / SAMPLE_INTERVAL) + 1 if SAMPLE_INTERVAL > 0 else 1)
+# Agent self-overhead, appended to each history row: the cost of monitoring, next to the hashrate it may tax
+AGENT_COLUMNS = ( 'agent_cpu_s', 'agent_children_cpu_s', 'agent_rss_MB', 'agent_threads', 'agent_tick_ms',
+                  'agent_report_bytes', 'agent_report_ms', 'agent_upload_bytes', 'agent_upload_ms' )
+PROCESS       = psutil.Process()
+CPU_TIMES     = [ PROCESS.cpu_times() ]  # at the previous row
+OVERHEAD      = collections.Counter()    # tick_ms of the previous metric task, report_*/upload_* since the previous row
+OVERHEAD_LOCK = threading.Lock()
+
+# Record the first time a startup phase is reached
+def Mark_Phase(name):
+    if name not in PHASES:
+        PHASES[name] = round(PROCESS_START_OFFSET + time.perf_counter() - START, 3)
+
+
+def get_mining_performance(api_url=API_URL):
     try:
 
         # Can implement the real-time performance minitoring here:
         # if performance_sol_s is zero or decreased in a specific time window, call the IMDS reallocate
-        response = requests.get(API_URL, timeout=1)
+        response = requests.get(api_url, timeout=1)
         data = response.json()
 
         algo       = data["Algorithms"][0]
@@ -52,36 +127,151 @@ def get_mining_performance():
         accepted   = algo["Total_Accepted"]
         rejected   = algo["Total_Rejected"]
 
-        worker     = data["Workers"][0]
-        power      = worker["Power"]
-        core_temp  = worker["Core_Temp"]
-        cclk       = worker["CCLK"]
-        
+        # One worker per GPU used by this miner
+        worker_perf = algo.get("Worker_Performance", [total_perf])
+        workers = [ { "performance_sol_s": worker_perf[i] if i < len(worker_perf) else 0,
+                      "power_watts":       worker["Power"],
+                      "core_temp_C":       worker["Core_Temp"],
+                      "core_clock_MHz":    worker["CCLK"] } for i, worker in enumerate(data["Workers"]) ]
+
         return { "performance_sol_s": total_perf,
-                 "power_watts": power,
-                 "core_temp_C": core_temp,
-                 "core_clock_MHz": cclk,
+                 "power_watts": round(sum(w["power_watts"] for w in workers), 3),
+                 "core_temp_C": max(w["core_temp_C"] for w in workers),
+                 "core_clock_MHz": round(sum(w["core_clock_MHz"] for w in workers) / len(workers)),
                  "accepted": accepted,
-                 "rejected": rejected }
+                 "rejected": rejected,
+                 "workers": workers }
     except Exception as e:
         return {"error": str(e)}
-    
+
+
+# Get the node-wide mining performance across all miners
+# A miner that does not respond counts as one idle worker, so the per-GPU positions stay aligned
+def get_mining_performance_all():
+    results = [ get_mining_performance(api_url) for api_url in API_URLS ]
+    if len(results) == 1 or all("error" in result for result in results):
+        return results[0]
+
+    idle = { "workers": [ {"performance_sol_s": 0, "power_watts": 0} ] }
+    running = [ result for result in results if "error" not in result ]
+    return { "performance_sol_s": sum(r["performance_sol_s"] for r in running),
+             "power_watts": round(sum(r["power_watts"] for r in running), 3),
+             "core_temp_C": max(r["core_temp_C"] for r in running),
+             "core_clock_MHz": round(sum(r["core_clock_MHz"] for r in running) / len(running)),
+             "accepted": sum(r["accepted"] for r in running),
+             "rejected": sum(r["rejected"] for r in running),
+             "workers": [ worker for r in results for worker in (idle if "error" in r else r)["workers"] ] }
+
+
+# Reduce the samples collected since the last metric task into sample_count + min/mean/max/p95 per field
+def Reduce_Samples():
+    samples = []
+    while SAMPLES:
+        samples.append(SAMPLES.popleft())
+
+    values = [len(samples)]
+    for field in SAMPLE_FIELDS:
+        column = sorted(sample[field] for sample in samples)
+        if not column:
+            values += [0, 0, 0, 0]
+            continue
+        p95 = column[ max(0, math.ceil(0.95 * len(column)) - 1) ] # nearest-rank percentile
+        values += [ column[0], round(sum(column) / len(column), 3), column[-1], p95 ]
+
+    return ",".join(str(x) for x in values)
+
+
+# Per-GPU values for multi-GPU nodes: utilization and temperature from nvidia-smi, performance and power from the miners
+def Per_GPU_Values(temp, temp_value):
+    gpus = temp.get('gpus', [])
+    workers = temp_value.get('workers', [])
+    values = []
+    for i in range(RESULT['gpu_number']):
+        gpu = gpus[i] if i < len(gpus) else {}
+        worker = workers[i] if i < len(workers) else {}
+        values += [ gpu.get('gpu_utilization_%', 0), gpu.get('gpu_temperature_C', 0),
+                    round(worker.get('performance_sol_s', 0), 3), worker.get('power_watts', 0) ]
+    return ",".join(str(x) for x in values)
+
+
+# Summarize the supervised miners into the report
+def Miner_States():
+    if not MINERS:
+        return
+    states = [ miner['state'] for miner in MINERS ]
+    RESULT["miner_state"]      = "stopped" if "stopped" in states else "restarting" if "restarting" in states else "running"
+    RESULT["miner_restarts"]   = sum(miner['restarts'] for miner in MINERS)
+    RESULT["miner_downtime_s"] = round(sum(miner['downtime_s'] for miner in MINERS), 3)
+    RESULT["miner_last_exit_code"] = max(MINERS, key=lambda miner: miner['exited_at'])['last_exit_code']
+    if len(MINERS) > 1:
+        RESULT["miners"] = [ { k: miner[k] for k in ('gpu', 'state', 'restarts', 'downtime_s', 'last_exit_code') } for miner in MINERS ]
+
+
+# Run the network test in the background, and fill in the network section when ready
+# It takes about a minute, so it no longer gates the first metrics or the miner start
+def Network_Task():
+    network = Network_Check()
+    Mark_Phase("network_test_done")
+    with GLOBAL_LOCK:
+        RESULT.update(network)
+    print(f'\n=========> Network Task Thread: network test completed - {network}', flush=True)
+
+
+# The agent overhead values of a history row: the CPU seconds used since the previous row, by the agent and by its
+# exited children (nvidia-smi, ping and speedtest forks, and a miner once it exits), the RSS and thread count now,
+# the duration of the previous metric task, and the bytes and milliseconds of the reports serialized and uploaded since
+def Agent_Overhead():
+    cpu, last = PROCESS.cpu_times(), CPU_TIMES[0]
+    CPU_TIMES[0] = cpu
+    with OVERHEAD_LOCK:
+        values = [ round(cpu.user + cpu.system - last.user - last.system, 3),
+                   round(cpu.children_user + cpu.children_system - last.children_user - last.children_system, 3),
+                   round(PROCESS.memory_info().rss / 1_000_000, 1), PROCESS.num_threads(), OVERHEAD['tick_ms'],
+                   OVERHEAD['report_bytes'], round(OVERHEAD['report_ms'], 1), OVERHEAD['upload_bytes'], round(OVERHEAD['upload_ms'], 1) ]
+        OVERHEAD.clear()
+    return ",".join(str(x) for x in values)
+
+
+# The object name of a report under FOLDER, partitioned by the online time at the start of the file name,
+# e.g. 2025-09-22_00-02-05_<machine id>.txt; the object of a node run stays in the same partition
+def Object_Key(file_name):
+    if KEY_LAYOUT == "date":
+        return f"{file_name[:10]}/{file_name}"
+    if KEY_LAYOUT == "hour":
+        return f"{file_name[:10]}/{file_name[11:13]}/{file_name}"
+    return file_name
+
+
 # Collect system metrics and put the report job into the queue
 def Metric_Task(queue):
-    global RESULT, NO
+    global RESULT, NO, HISTORY
 
-    # The 1st may take over 1 minutes, due to the network test
     with GLOBAL_LOCK:  # Ensure only one thread at a time can update RESULT
         END = time.perf_counter()
         if RESULT == {}: # First time only
-            RESULT = temp = System_Check(NETWORK_TEST=True) 
+            RESULT = temp = System_Check(NETWORK_TEST=False) # The network test runs asynchronously in Network_Task
+            RESULT.update(Network_Pending())
+            threading.Thread(target=Network_Task, daemon=True).start()
+            Mark_Phase("first_metric")
             RESULT['metric_interval_s'] = METRIC_INTERVAL
             RESULT['report_number']     = REPORT_NUMBER
             RESULT['miner_algorithm']   = "zelhash" # "octopus" if RESULT['gpu_vram_total_MiB'] >= 12000 else "zelhash"
+            if SAMPLE_INTERVAL > 0:
+                RESULT['sample_interval_s'] = SAMPLE_INTERVAL
+                RESULT['history_column']   += ', sample_count, ' + ', '.join(f"{field}_{stat}" for field in SAMPLE_FIELDS for stat in SAMPLE_STATS)
+            RESULT['history_column'] += ', ' + ', '.join(f"log_{event}" for event in MINER_LOG_EVENTS)
+            if RESULT.get('gpu_number', 1) > 1:
+                RESULT['history_column'] += ', ' + ', '.join(f"gpu{i}_{field}" for i in range(RESULT['gpu_number'])
+                                                             for field in ('utilization_%', 'temperature_C', 'performance_sol_s', 'power_watts'))
+            RESULT['history_column'] += ', timestamp_epoch, ' + ', '.join(AGENT_COLUMNS)
+            RESULT.pop('history') # Written last in each report, streamed from the history store
+            RESULT['history_retention'] = HISTORY_RETENTION
+            HISTORY = History(RESULT['history_column'], HISTORY_RETENTION, HISTORY_MAX_ROWS, HISTORY_RECENT_ROWS, HISTORY_TIER_FACTOR)
         else:            # Skip the network test for subsequent runs
             temp = System_Check(NETWORK_TEST=False)
     
         RESULT['last_update'] = temp['last_update']
+        RESULT['last_update_epoch'] = temp['last_update_epoch']
         RESULT['uptime_s']    = round(END - START,3)
         RESULT['no']          = NO
 
@@ -90,28 +280,85 @@ def Metric_Task(queue):
         else:
             value = f"{NO},{temp['last_update']},0,0,0,0,0,0"
 
-        temp_value = get_mining_performance()   
+        temp_value = get_mining_performance_all()
         if len(temp_value) > 1: # Successfully collected mining metrics
             # print(f'\n+++++++++> Metric Task Thread: get mining performance - {temp_value}', flush=True)
             value = value + f",{round(temp_value['performance_sol_s'],3)},{temp_value['power_watts']},{temp_value['core_temp_C']},{temp_value['core_clock_MHz']},{temp_value['accepted']},{temp_value['rejected']}"
+            if temp_value['performance_sol_s'] > 0:
+                Mark_Phase("first_hash")
+            if temp_value['accepted'] > 0:
+                Mark_Phase("first_share")
         else:
             print(f'\n+++++++++> Metric Task Thread: errors while getting mining performance: {temp_value}', flush=True)
             value = value + ",0,0,0,0,0,0"
 
-        RESULT['history'].append(value)
+        if SAMPLE_INTERVAL > 0:
+            value = value + "," + Reduce_Samples()
+
+        with EVENTS_LOCK:
+            value = value + "," + ",".join(str(INTERVAL_EVENTS[event]) for event in MINER_LOG_EVENTS)
+            INTERVAL_EVENTS.clear()
+            RESULT['miner_events'] = { event: EVENTS[event] for event in MINER_LOG_EVENTS }
+
+        if RESULT.get('gpu_number', 1) > 1:
+            value = value + "," + Per_GPU_Values(temp, temp_value)
+
+        value = value + f",{temp['last_update_epoch']}," + Agent_Overhead()
+
+        Miner_States()
+
+        HISTORY.append(value)
+        if METRICS_PORT > 0:
+            ROWS.append(Row_Values(RESULT['history_column'], value))
+        RESULT['startup_phases_s'] = dict(PHASES)  # a snapshot, other threads may mark phases while serializing
+
+        if COLLECTOR_URL:
+            run = RESULT["online"].replace(":", "-").replace(" ", "_") + "_" + temp["salad_machine_id"]
+            collector_queue.put( {'run': run, 'row': value, 'header': dict(RESULT) if NO % REPORT_NUMBER == 0 else None} )
     
         if NO % REPORT_NUMBER == 0: 
             UID = str(uuid.uuid4()) + ".txt"
             FILE_NAME = RESULT["online"].replace(":", "-").replace(" ", "_") + "_" + temp["salad_machine_id"] + ".txt"
+            report_start = time.perf_counter()
             with open(UID, 'w') as f:
-                json.dump(RESULT, f, indent=2)
-            queue.put( {'source': UID, 'filename': FILE_NAME, 'no': str(NO)} )  
+                HISTORY.write_json(f, RESULT)
+            with OVERHEAD_LOCK:
+                OVERHEAD['report_ms'] += (time.perf_counter() - report_start) * 1000
+                OVERHEAD['report_bytes'] += os.path.getsize(UID)
+            queue.put( {'source': UID, 'filename': FILE_NAME, 'key': Object_Key(FILE_NAME), 'no': str(NO)} )  
+
+        with OVERHEAD_LOCK:
+            OVERHEAD['tick_ms'] = round((time.perf_counter() - END) * 1000, 1)
 
         print(f'\n+++++++++> Metric Task Thread: collected metrics - {value}', flush=True)
 
         NO += 1
 
 
+# Read the GPU sampler stream and poll the miner, feeding the ring buffer every SAMPLE_INTERVAL seconds
+def Sampler():
+    def loop():
+        while True:
+            try:
+                proc = Start_GPU_Sampler(SAMPLE_INTERVAL * 1000)
+                for line in proc.stdout:
+                    index, sample = Parse_GPU_Sample(line)
+                    if index != 0: # the first GPU only
+                        continue
+                    sample['performance_sol_s'] = get_mining_performance_all().get('performance_sol_s', 0)
+                    SAMPLES.append(sample)
+                    if METRICS_PORT > 0:
+                        SAMPLE_ROWS.append(dict(sample))
+                    if sample['performance_sol_s'] > 0:
+                        Mark_Phase("first_hash")
+                proc.wait()
+            except Exception as e:
+                print(f'\n=========> Sampler Thread: errors while sampling: {e}', flush=True)
+            time.sleep(METRIC_INTERVAL) # nvidia-smi exited, retry later
+
+    threading.Thread(target=loop, daemon=True).start()    # Start the sampler thread in the background
+
+
 def Scheduler(queue, interval, func):     
     def loop():                    # Run and then sleep
         next_time = time.time()    # Initial start time
@@ -142,15 +389,20 @@ def Uploader(queue):
             message = queue.get()  # May block here
             queue.task_done()
 
-            result = Uploader_Chunked_Parallel(message['no'], message['source'],BUCKET, PREFIX, FOLDER, message['filename'], '1MB',10)
-            print(f"\n---------> Uploader Thread: report metrics to {message['no']} - {result}", flush=True)
-
-            if len(result) <= 1:  # Upload failed
-                UPLOAD_FAILURE_COUNT += 1
-                if UPLOAD_FAILURE_COUNT >= MAX_UPLOAD_FAILURE_COUNT:
-                    Reallocate("2 or more consecutive upload failures")
-            else:                 # Upload succeeded
-                UPLOAD_FAILURE_COUNT = 0  # Reset the counter after uploading a file successfully
+            if REPORT_SINK != "collector":
+                upload_start = time.perf_counter()
+                result = Uploader_Chunked_Parallel(message['no'], message['source'],BUCKET, PREFIX, FOLDER, message['key'], '1MB',10)
+                with OVERHEAD_LOCK:
+                    OVERHEAD['upload_ms'] += (time.perf_counter() - upload_start) * 1000
+                    OVERHEAD['upload_bytes'] += os.path.getsize(message['source'])
+                print(f"\n---------> Uploader Thread: report metrics to {message['no']} - {result}", flush=True)
+
+                if len(result) <= 1:  # Upload failed
+                    UPLOAD_FAILURE_COUNT += 1
+                    if UPLOAD_FAILURE_COUNT >= MAX_UPLOAD_FAILURE_COUNT:
+                        Reallocate("2 or more consecutive upload failures")
+                else:                 # Upload succeeded
+                    UPLOAD_FAILURE_COUNT = 0  # Reset the counter after uploading a file successfully
 
             shutil.copy(message['source'], message['filename']) # Update the local copy using the temp file
             os.remove(message['source'])                        # Remove the temp file
@@ -158,8 +410,116 @@ def Uploader(queue):
     threading.Thread(target=loop, daemon=True).start()    # Start the uploader thread in the background
 
 
+# Push the history rows to the collector; the rows of a failed push are kept, up to COLLECTOR_MAX_PENDING,
+# and sent again with the next one, along with the latest report header not yet delivered
+def Collector_Pusher(queue):
+    def loop():
+        pending = collections.deque(maxlen=COLLECTOR_MAX_PENDING)
+        header = None
+        headers = { "Authorization": f"Bearer {COLLECTOR_TOKEN}" } if COLLECTOR_TOKEN else {}
+        while True:
+            message = queue.get()  # May block here
+            queue.task_done()
+            pending.append(message['row'])
+            if message['header'] is not None:
+                header = message['header']
+
+            payload = { 'run': message['run'], 'rows': list(pending) } | ({ 'header': header } if header else {})
+            try:
+                response = requests.post(COLLECTOR_URL + "/push", json=payload, headers=headers, timeout=10)
+                response.raise_for_status()
+                pending.clear()
+                header = None
+            except requests.RequestException as e:
+                print(f"\n---------> Collector Pusher Thread: push failed, {len(pending)} rows pending - {e}", flush=True)
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+# Read the miner output line by line until it exits: count share, reconnect and error events,
+# and write the lines to the size-capped, rotated LOCAL_LOG_FILE
+def Miner_Log_Tailer(stream, tag=""):
+    for line in stream:
+        line, event = Parse_Miner_Log_Line(line)
+        MINER_LOG.info(tag + line)
+        if event is None:
+            continue
+        with EVENTS_LOCK:
+            EVENTS[event] += 1
+            INTERVAL_EVENTS[event] += 1
+        if event == "accepted":
+            Mark_Phase("first_share")
+
+
+# The state of a supervised miner; gpu is None for the single miner
+def New_Miner(gpu, cmd, env):
+    return { 'gpu': gpu, 'cmd': cmd, 'env': env, 'state': "running", 'restarts': 0, 'downtime_s': 0, 'last_exit_code': None, 'exited_at': 0 }
+
+
+# The miner command with its own API port
+def Miner_Command(api_port):
+    cmd = list(CMD_ZELHASH) # CMD_OCTOPUS if RESULT['gpu_vram_total_MiB'] >= 12000 else CMD_ZELHASH
+    cmd[cmd.index("--apiport") + 1] = str(api_port)
+    return cmd
+
+
+# Run a miner and restart it whenever it exits for any reason, so GPU time is never silently wasted
+# Restarts back off exponentially; too many consecutive crash loops reallocate the node
+def Miner_Supervisor(miner):
+    tag = "" if miner['gpu'] is None else f"[gpu{miner['gpu']}] "
+    crash_loops = 0
+    backoff = MINER_BACKOFF_MIN
+    while True:
+        Mark_Phase("miner_spawn")
+        started = time.perf_counter()
+        try: # Run the miner and stream its output through the log tailer
+            proc = subprocess.Popen(miner['cmd'], env=miner['env'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, errors="replace")
+            Miner_Log_Tailer(proc.stdout, tag)
+            exit_code = proc.wait()
+        except OSError as e:
+            print(f"\n*********> Miner Supervisor: {tag}failed to start the miner: {e}", flush=True)
+            exit_code = None
+        stopped = time.perf_counter()
+
+        if stopped - started < MINER_MIN_RUN_TIME:
+            crash_loops += 1
+        else:
+            crash_loops = 0
+            backoff = MINER_BACKOFF_MIN
+        print(f"\n*********> Miner Supervisor: {tag}the miner exited with {exit_code} after {stopped - started:.0f} seconds, crash loops: {crash_loops}", flush=True)
+
+        with GLOBAL_LOCK:
+            miner['state']          = "restarting"
+            miner['last_exit_code'] = exit_code
+            miner['exited_at']      = stopped
+
+        if crash_loops >= MINER_MAX_CRASH_LOOPS:
+            with GLOBAL_LOCK:
+                miner['state'] = "stopped"
+            Reallocate(f"{tag}{crash_loops} consecutive lolMiner crash loops")
+
+        time.sleep(backoff)
+        backoff = min(backoff * 2, MINER_BACKOFF_MAX)
+
+        with GLOBAL_LOCK:
+            miner['state']       = "running"
+            miner['restarts']   += 1
+            miner['downtime_s'] += time.perf_counter() - stopped
+
+
+Mark_Phase("agent_start")
+
 # For communication between the metric task and the uploader
 upload_queue = queue.Queue() 
+collector_queue = queue.Queue()
+
+if SAMPLE_INTERVAL > 0:
+    print(f"\nStarting the sampler thread to sample metrics every {SAMPLE_INTERVAL} seconds ...")
+    Sampler()
+
+if METRICS_PORT > 0:
+    print(f"\nStarting the metrics endpoint on {METRICS_HOST}:{METRICS_PORT} ...")
+    Start_Metrics_Server(METRICS_PORT, ROWS, SAMPLE_ROWS, lambda: { "machine_id": RESULT.get("salad_machine_id", "") }, METRICS_HOST, METRICS_TOKEN)
 
 print("\nStarting the scheduler thread to collect metrics ...")
 Scheduler(upload_queue, METRIC_INTERVAL, Metric_Task)
@@ -167,6 +527,10 @@ Scheduler(upload_queue, METRIC_INTERVAL, Metric_Task)
 print("\nStarting the uploader thread ...")
 Uploader(upload_queue)
 
+if COLLECTOR_URL:
+    print(f"\nStarting the collector pusher thread to push metrics to {COLLECTOR_URL} ...")
+    Collector_Pusher(collector_queue)
+
 print("\nThe miner: wait until the first metrics are collected ...")
 while True:
     if RESULT == {}: 
@@ -175,14 +539,17 @@ while True:
         time.sleep(2)
         break
 
-cmd = CMD_ZELHASH # CMD_OCTOPUS if RESULT['gpu_vram_total_MiB'] >= 12000 else CMD_ZELHASH
-print("\nStarting the Miner: " + " ".join(cmd))
-
-#subprocess.run(cmd) # Restart/Reallocate/Reallocate here after the miner stops for any reason
-
-with open(LOCAL_LOG_FILE, "w") as f:
-    # Run the miner and redirect stdout/stderr to the file
-    subprocess.run(cmd, stdout=f, stderr=f) # Restart/Reallocate/Reallocate here after the miner stops for any reason
-
-RESULT["miner_state"] = "stopped"
-time.sleep(1000000) # 11+ days
\ No newline at end of file
+if MINER_MODE == "per_gpu" and RESULT.get('gpu_number', 1) > 1:
+    for i in range(RESULT['gpu_number']):
+        # Order CUDA devices as nvidia-smi does, so miner i runs on the GPU reported as gpu{i}
+        env = os.environ | { "CUDA_VISIBLE_DEVICES": str(i), "CUDA_DEVICE_ORDER": "PCI_BUS_ID" }
+        MINERS.append( New_Miner(i, Miner_Command(API_PORT + i), env) )
+else:
+    MINERS.append( New_Miner(None, Miner_Command(API_PORT), None) )
+API_URLS = [ f"http://localhost:{API_PORT + i}/" for i in range(len(MINERS)) ]
+
+for miner in MINERS:
+    print("\nStarting the Miner: " + " ".join(miner['cmd']))
+for miner in MINERS[1:]:
+    threading.Thread(target=Miner_Supervisor, args=(miner,), daemon=True).start()
+Miner_Supervisor(MINERS[0]) # Never returns
@@ -0,0 +1,75 @@
+from profiling import Instrument
+from analysis import Get_AbnormalNodeRuns, \
+    Get_TimestampRange, \
+    Datetime_Epoch, \
+    DATA_LIST, \
+    TIME_INTERVAL_10MIN
+
+
+# Per-machine reliability: a hash index from salad_machine_id to its node runs in online order, built once at load,
+# so host-level questions are dict lookups, e.g. MACHINE_INDEX[machine_id] for the node runs of a host and
+# MACHINE_RELIABILITY[machine_id] for its aggregates (Get_Machine_Reliability):
+#   runs, stopped           - node runs, and the ones that stopped before the end of the test (last_update < end - 10 minutes)
+#   uptime_h, mean_uptime_h - total and mean uptime of its node runs
+#   interruptions_per_day   - stopped node runs per 24 hours of uptime
+#   abnormal_ratio          - share of its node runs flagged by Get_AbnormalNodeRuns (0 without the history)
+#   mean_idle_h             - mean time from the last update of a node run to the online of the next one (0 if they overlap),
+#                           None for one run
+MACHINE_MIN_RUNS = 2    # machines with fewer node runs are left out of the ranking
+MACHINE_RANK_KEY = ( 'interruptions_per_day', 'abnormal_ratio' )  # the ranking order, least reliable first
+
+
+# {machine id: [node runs, in online order]}
+def Get_Machine_Index(data_list):
+    machine_index = {}
+    for node_run in data_list:
+        machine_index.setdefault(node_run.get('salad_machine_id', "none"), []).append(node_run)
+    for node_runs in machine_index.values():
+        node_runs.sort(key=lambda x: x.online_epoch)
+    return machine_index
+
+
+# {machine id: aggregates}, see above; end is the end of the test (datetime)
+def Get_Machine_Reliability(machine_index, end):
+    stopped_before = Datetime_Epoch(end - TIME_INTERVAL_10MIN)
+    # The abnormal checks read the history; without it (DATA_HISTORY=none) no node run counts as abnormal
+    abnormal = set(online for _, online in Get_AbnormalNodeRuns([ x for node_runs in machine_index.values() for x in node_runs if x.get('history') ]))
+    machine_reliability = {}
+
+    for machine_id, node_runs in machine_index.items():
+        uptime = sum(x.uptime_s for x in node_runs)
+        stopped = sum(1 for x in node_runs if x.last_update_epoch < stopped_before)
+        idles = [ max(0, b.online_epoch - a.last_update_epoch) for a, b in zip(node_runs, node_runs[1:]) ]
+        machine_reliability[machine_id] = { 'runs':                  len(node_runs),
+                                            'stopped':               stopped,
+                                            'uptime_h':              uptime / 3600,
+                                            'mean_uptime_h':         uptime / 3600 / len(node_runs),
+                                            'interruptions_per_day': stopped / uptime * 86400 if uptime > 0 else 0,
+                                            'abnormal_ratio':        sum(1 for x in node_runs if x.online in abnormal) / len(node_runs),
+                                            'mean_idle_h':           sum(idles) / len(idles) / 3600 if idles else None }
+    return machine_reliability
+
+
+# The machines with at least min_runs node runs, ranked by the keys (least reliable first)
+# Returns [(machine id, aggregates)]; the top k only if k is set
+def Get_Machine_Ranking(machine_reliability, keys=MACHINE_RANK_KEY, min_runs=MACHINE_MIN_RUNS, k=None):
+    ranking = sorted(( x for x in machine_reliability.items() if x[1]['runs'] >= min_runs ),
+                     key=lambda x: tuple(-x[1][key] for key in keys))
+    return ranking[:k] if k else ranking
+
+
+Instrument(globals())
+MACHINE_INDEX = Get_Machine_Index(DATA_LIST)
+MACHINE_RELIABILITY = Get_Machine_Reliability(MACHINE_INDEX, Get_TimestampRange(DATA_LIST)[1]) if DATA_LIST else {}
+
+
+if __name__ == "__main__":
+
+    ranking = Get_Machine_Ranking(MACHINE_RELIABILITY)
+    print(f"----> Machines: {len(MACHINE_INDEX)}, with at least {MACHINE_MIN_RUNS} node runs: {len(ranking)}")
+
+    print("----> Reliability ranking, least reliable first (machine id, runs, stopped, uptime_h, mean_uptime_h, interruptions/day, abnormal %, mean idle h):")
+    for machine_id, x in ranking:
+        idle = "" if x['mean_idle_h'] is None else f"{x['mean_idle_h']:.2f}"
+        print(f"{machine_id}, {x['runs']}, {x['stopped']}, {x['uptime_h']:.2f}, {x['mean_uptime_h']:.2f}, "
+              f"{x['interruptions_per_day']:.2f}, {x['abnormal_ratio']*100:.1f}, {idle}")
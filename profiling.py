@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import functools
+import contextlib
+
+try:
+    import resource  # not on Windows, the RSS columns stay empty there
+except ImportError:
+    resource = None
+
+
+# Lightweight instrumentation for the analysis and draw stages, off unless PROFILE=1
+#   Stage(name)        - a context manager recording one call of a stage
+#   Profiled(fn)       - a decorator, a stage named after the function
+#   Instrument(names)  - wrap every Get_* and Plot_* function of a module namespace, e.g. Instrument(globals())
+# Per stage: calls, wall time (inclusive of nested stages), the process peak RSS after the stage and how much
+# the stage raised it, and optionally a cProfile dump (PROFILE_CPROFILE=1, one .prof file per top-level stage)
+# The summary table is printed at exit, and written as JSON to PROFILE_OUTPUT if set
+PROFILE          = os.getenv("PROFILE", "0") == "1"
+PROFILE_CPROFILE = os.getenv("PROFILE_CPROFILE", "0") == "1"
+PROFILE_DIR      = os.getenv("PROFILE_DIR", "output/profile")  # the cProfile dumps, e.g. python -m pstats output/profile/Get_DataList.prof
+PROFILE_OUTPUT   = os.getenv("PROFILE_OUTPUT", "")             # e.g. output/profile.json
+PROFILE_PREFIXES = ( "Get_", "Plot_" )
+
+STAGES    = {}   # name: {calls, wall_s, peak_rss_MB, rss_growth_MB}
+PROFILERS = {}   # name: cProfile.Profile, accumulated over the calls of the stage
+DEPTH     = [0]  # nesting depth of the running stages, cProfile only runs in the outermost one
+
+
+# The process peak RSS so far, in MB; ru_maxrss is in KB on Linux and in bytes on macOS
+def Get_Peak_RSS():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+@contextlib.contextmanager
+def Stage(name):
+    if not PROFILE:
+        yield
+        return
+
+    stage = STAGES.setdefault(name, { 'calls': 0, 'wall_s': 0.0, 'peak_rss_MB': None, 'rss_growth_MB': 0.0 })
+    profiler = None
+    if PROFILE_CPROFILE and DEPTH[0] == 0:
+        profiler = PROFILERS.setdefault(name, cProfile.Profile())
+        profiler.enable()
+    DEPTH[0] += 1
+    rss = Get_Peak_RSS()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage['wall_s'] += time.perf_counter() - start
+        stage['calls'] += 1
+        DEPTH[0] -= 1
+        if profiler is not None:
+            profiler.disable()
+        if rss is not None:
+            stage['peak_rss_MB'] = Get_Peak_RSS()
+            stage['rss_growth_MB'] += stage['peak_rss_MB'] - rss
+
+
+def Profiled(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with Stage(fn.__name__):
+            return fn(*args, **kwargs)
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+# Wrap the Get_*/Plot_* functions of a module namespace in place; functions imported from an instrumented module
+# are already wrapped and stay as they are
+def Instrument(names):
+    if not PROFILE:
+        return
+    for name, fn in list(names.items()):
+        if name.startswith(PROFILE_PREFIXES) and callable(fn) and not getattr(fn, "__profiled__", False):
+            names[name] = Profiled(fn)
+
+
+def Print_Profile():
+    print(f"----> Profile, {len(STAGES)} stages (wall time includes nested stages):")
+    print(f"{'stage':<34} {'calls':>6} {'wall_s':>10} {'per_call_s':>11} {'peak_rss_MB':>12} {'rss_growth_MB':>14}")
+    for name, stage in sorted(STAGES.items(), key=lambda x: -x[1]['wall_s']):
+        peak = "" if stage['peak_rss_MB'] is None else f"{stage['peak_rss_MB']:.1f}"
+        print(f"{name:<34} {stage['calls']:>6} {stage['wall_s']:>10.3f} {stage['wall_s'] / stage['calls']:>11.4f} {peak:>12} {stage['rss_growth_MB']:>14.1f}")
+
+
+def Write_Profile(file_name):
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    with open(file_name, "w") as f:
+        json.dump({ 'argv': sys.argv, 'stages': STAGES }, f, indent=2)
+    print(f"----> Profile written to {file_name}")
+
+
+def Dump_Profilers():
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    for name, profiler in PROFILERS.items():
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}.prof"))
+    print(f"----> cProfile dumps of {len(PROFILERS)} stages written to {PROFILE_DIR}")
+
+
+def Report():
+    if not STAGES:
+        return
+    Print_Profile()
+    if PROFILE_OUTPUT:
+        Write_Profile(PROFILE_OUTPUT)
+    if PROFILERS:
+        Dump_Profilers()
+
+
+if PROFILE:
+    atexit.register(Report)
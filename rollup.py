@@ -0,0 +1,113 @@
+from datetime import timedelta
+import numpy as np
+
+from profiling import Stage, Instrument
+from analysis import Get_AbnormalNodeRuns, Get_History_Columns, \
+    DATA_LIST, EPOCH, \
+    TIME_INTERVAL_1HOUR
+
+
+# Rollup cube over (gpu_type, country, hour bucket), built once at load time
+# Measures, each an array of shape (gpu types, countries, hours):
+#   runs            - node runs active at any time in the hour
+#   allocations     - node runs that came online in the hour
+#   active_minutes  - instance-minutes in the hour
+#   sol_sum/sol_count - performance_sol_s samples in the hour, for the mean
+#   abnormal        - abnormal node runs (Get_AbnormalNodeRuns), by the hour they came online
+ROLLUP_MEASURES = [ 'runs', 'allocations', 'active_minutes', 'sol_sum', 'sol_count', 'abnormal' ]
+
+
+def Build_Rollup(data_list, interval=TIME_INTERVAL_1HOUR):
+    gpu_types = sorted(set(node_run.get('gpu_type', "none") for node_run in data_list))
+    countries = sorted(set(node_run.get('country', "none") for node_run in data_list))
+    if not data_list:
+        return { 'gpu_types': [], 'countries': [], 'start': None, 'interval': interval, 'hours': 0 } | \
+               { measure: np.zeros((0, 0, 0)) for measure in ROLLUP_MEASURES }
+
+    # Parse every timestamp once, as epoch seconds
+    onlines = np.array([ node_run['online_epoch'] for node_run in data_list ], dtype=float)
+    updates = np.array([ node_run['last_update_epoch'] for node_run in data_list ], dtype=float)
+    step = interval.total_seconds()
+    start = np.floor(onlines.min() / step) * step
+    hours = int((updates.max() - start) // step) + 1
+
+    shape = (len(gpu_types), len(countries), hours)
+    cube = { 'gpu_types': gpu_types, 'countries': countries, 'start': EPOCH + timedelta(seconds=start), 'interval': interval, 'hours': hours } | \
+           { measure: np.zeros(shape) for measure in ROLLUP_MEASURES }
+    gpu_index = { gpu_type: i for i, gpu_type in enumerate(gpu_types) }
+    country_index = { country: i for i, country in enumerate(countries) }
+    abnormal = set(online for _, online in Get_AbnormalNodeRuns(data_list))
+
+    for node_run, online, update in zip(data_list, onlines, updates):
+        g = gpu_index[node_run.get('gpu_type', "none")]
+        c = country_index[node_run.get('country', "none")]
+        h0, h1 = int((online - start) // step), int((update - start) // step)
+
+        # Overlap of [online, last_update] with each bucket it touches
+        edges = start + np.arange(h0, h1 + 2) * step
+        overlap = np.minimum(edges[1:], update) - np.maximum(edges[:-1], online)
+        cube['runs'][g, c, h0:h1 + 1] += 1
+        cube['active_minutes'][g, c, h0:h1 + 1] += np.maximum(overlap, 0) / 60
+        cube['allocations'][g, c, h0] += 1
+        if node_run['online'] in abnormal:
+            cube['abnormal'][g, c, h0] += 1
+
+        # Performance samples, bucketed by the row timestamps
+        if node_run.get('history'):  # not loaded with DATA_HISTORY=none
+            ts, sol = ( np.asarray(x, dtype=float) for x in Get_History_Columns(node_run, ['timestamp', 'performance_sol_s']) )
+            buckets = np.clip(((ts - start) // step).astype(int), 0, hours - 1)
+            cube['sol_sum'][g, c] += np.bincount(buckets, weights=sol, minlength=hours)
+            cube['sol_count'][g, c] += np.bincount(buckets, minlength=hours)
+
+    return cube
+
+
+# The hour bucket range [h0, h1) covering the time window [start, end), either can be None
+def Get_Rollup_Hours(cube, start, end):
+    h0 = 0 if start is None else max(0, int((start - cube['start']) / cube['interval']))
+    h1 = cube['hours'] if end is None else max(h0, min(cube['hours'], int(-((cube['start'] - end) // cube['interval']))))
+    return h0, h1
+
+
+# Select a slice of the cube: a GPU type and/or a country (None for all), and a time window [start, end)
+# Returns {measure: array over hours}, plus 'mean_sol_s' and 'timestamps'
+def Get_Rollup_Slice(cube, gpu_type=None, country=None, start=None, end=None):
+    g = slice(None) if gpu_type is None else [ cube['gpu_types'].index(gpu_type) ] if gpu_type in cube['gpu_types'] else []
+    c = slice(None) if country is None else [ cube['countries'].index(country) ] if country in cube['countries'] else []
+    h0, h1 = Get_Rollup_Hours(cube, start, end)
+
+    result = { measure: cube[measure][g][:, c][:, :, h0:h1].sum(axis=(0, 1)) for measure in ROLLUP_MEASURES }
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result['mean_sol_s'] = np.where(result['sol_count'] > 0, result['sol_sum'] / result['sol_count'], 0)
+    result['timestamps'] = [ cube['start'] + cube['interval'] * h for h in range(h0, h1) ]
+    return result
+
+
+# Top-k GPU types or countries (by = 'gpu_type' or 'country') for a measure, over an optional time window
+def Get_Rollup_TopK(cube, measure='allocations', by='gpu_type', k=10, start=None, end=None):
+    labels = cube['gpu_types'] if by == 'gpu_type' else cube['countries']
+    h0, h1 = Get_Rollup_Hours(cube, start, end)
+    totals = cube[measure][:, :, h0:h1].sum(axis=(1, 2) if by == 'gpu_type' else (0, 2))
+    order = np.argsort(-totals, kind='stable')[:k]
+    return [ (labels[i], totals[i]) for i in order ]
+
+
+Instrument(globals())
+with Stage("Build_Rollup"):
+    ROLLUP = Build_Rollup(DATA_LIST)
+
+
+if __name__ == "__main__":
+
+    print("----> Top 10 GPU types by allocations:")
+    for gpu_type, count in Get_Rollup_TopK(ROLLUP, 'allocations', 'gpu_type'):
+        print(f"{gpu_type}: {count:.0f}")
+
+    print("----> Top 10 countries by active instance-hours:")
+    for country, minutes in Get_Rollup_TopK(ROLLUP, 'active_minutes', 'country'):
+        print(f"{country}: {minutes/60:.1f}")
+
+    print("----> Hourly availability (average running instances) and mean performance, all GPU types and countries:")
+    temp = Get_Rollup_Slice(ROLLUP)
+    for t, minutes, sol in zip(temp['timestamps'], temp['active_minutes'], temp['mean_sol_s']):
+        print(f"{t}: {minutes/60:.2f} instances, {sol:.2f} sol/s")
@@ -4,6 +4,8 @@ import time
 import boto3
 import sys
 import json
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 from boto3.s3.transfer import TransferConfig
 from dotenv import load_dotenv
 from collections import defaultdict
@@ -19,6 +21,13 @@ BUCKET     = os.getenv("BUCKET")
 PREFIX     = os.getenv("PREFIX","")
 FOLDER     = os.getenv("FOLDER")
 
+# The agents upload to FOLDER/<file> (KEY_LAYOUT=flat), FOLDER/2025-09-22/<file> (date) or FOLDER/2025-09-22/00/<file> (hour)
+# The partitions are listed level by level with a delimiter, in parallel, and any mix of layouts is merged
+# A new object only appears in the partition of its online time, so a partition closed for LIST_SETTLE_HOURS
+# keeps its listing from the previous fetch, and only the recent partitions are listed again
+LIST_WORKERS      = int(os.getenv("LIST_WORKERS", 16))
+LIST_SETTLE_HOURS = float(os.getenv("LIST_SETTLE_HOURS", 2))  # 2 hours, for late uploads and clock skew on the nodes
+
 S3Client = boto3.client(
     "s3",
     endpoint_url=AWS_ENDPOINT_URL,
@@ -28,6 +37,7 @@ S3Client = boto3.client(
 )
 
 g_files = []
+g_partitions = {}  # prefix: (keys, subprefixes), the listings of the closed partitions
 
 # Ensure "data" subfolder exists
 os.makedirs("data", exist_ok=True)
@@ -48,26 +58,60 @@ def fetchFiles():
         print("Missing BUCKET or FOLDER")
         return []
 
-    paginator = S3Client.get_paginator('list_objects_v2')
-    files = []
-
     if PREFIX == "":
         Prefix=FOLDER
     else:
         Prefix=PREFIX + "/" + FOLDER
     
-    for page in paginator.paginate(
-        Bucket=BUCKET,
-        Prefix=Prefix    
-    ):
+    start = time.time()
+    files = []
+    level = [ Prefix + "/" ]
+    listed = 0
+    with ThreadPoolExecutor(max_workers=LIST_WORKERS) as pool:
+        while level:
+            cached = [ p for p in level if p in g_partitions ]
+            todo = [ p for p in level if p not in g_partitions ]
+            results = dict(zip(todo, pool.map(listPartition, todo)))
+            listed += len(todo)
+            level = []
+            for p in cached + todo:
+                keys, subprefixes = g_partitions[p] if p in g_partitions else results[p]
+                if p in results and partitionClosed(p[len(Prefix) + 1:]):
+                    g_partitions[p] = results[p]
+                files += keys
+                level += subprefixes
+
+    files.sort()
+    g_files = [ key[len(Prefix) + 1:] for key in files ]  # the path under the folder, just the file name with the flat layout
+    print(f"----> Fetched {len( g_files )} files from R2:{BUCKET}/{Prefix}/ in {time.time() - start:.1f}s ({listed} prefixes listed, {len(g_partitions)} closed partitions cached)")
+
+
+# List one level under a prefix: (object keys, subprefixes)
+def listPartition(prefix):
+    paginator = S3Client.get_paginator('list_objects_v2')
+    keys, subprefixes = [], []
+    for page in paginator.paginate(Bucket=BUCKET, Prefix=prefix, Delimiter='/'):
         for obj in page.get('Contents', []):
-            # Remove the folder prefix from the key if you want just the file name
-            key = obj['Key']
-            if key.endswith('/'):
-                continue  # skip folder itself
-            files.append(key)
-            g_files.append(key.split('/')[-1])  # store just the file name    
-    print(f"----> Fetched {len( g_files )} files from R2:{BUCKET}/{Prefix}/")
+            if not obj['Key'].endswith('/'):  # skip folder itself
+                keys.append(obj['Key'])
+        for p in page.get('CommonPrefixes', []):
+            subprefixes.append(p['Prefix'])
+    return keys, subprefixes
+
+
+# Whether no new object can appear under a partition, e.g. "2025-09-22/" or "2025-09-22/00/"; the folder itself never closes
+def partitionClosed(partition):
+    parts = partition.strip('/').split('/')
+    try:
+        if len(parts) == 1 and parts[0]:
+            end = datetime.strptime(parts[0], "%Y-%m-%d") + timedelta(days=1)
+        elif len(parts) == 2:
+            end = datetime.strptime(f"{parts[0]} {parts[1]}", "%Y-%m-%d %H") + timedelta(hours=1)
+        else:
+            return False
+    except ValueError:
+        return False
+    return end.replace(tzinfo=timezone.utc) + timedelta(hours=LIST_SETTLE_HOURS) < datetime.now(timezone.utc)
 
 
 def downloadFile(file_name):
@@ -87,7 +131,7 @@ def downloadFile(file_name):
         #print(f"\nContent of {file_name}: \n{content}")
 
         # Save to local file inside "data/"
-        local_path = os.path.join("data", file_name)
+        local_path = os.path.join("data", file_name.split('/')[-1])
         with open(local_path, 'w', encoding='utf-8') as f:
             f.write(content)
         print(f"Saved to local file: {local_path}")
@@ -113,7 +157,7 @@ def showFile(file_name):
         print(f"\nContent of {file_name}: \n{content}")
 
         # Save to local file inside "data/"
-        local_path = os.path.join("data", file_name)
+        local_path = os.path.join("data", file_name.split('/')[-1])
         with open(local_path, 'w', encoding='utf-8') as f:
             f.write(content)
         print(f"Saved to local file: {local_path}")
@@ -155,6 +199,7 @@ def resetFolder():
                 Delete={'Objects': to_delete[i:i+1000]}
             )
         print(f"----> Deleted {len(to_delete)} objects from R2:{BUCKET}/{Prefix}/")
+        g_partitions.clear()
     else:
         print("----> No objects to delete.")
     
@@ -0,0 +1,222 @@
+import os
+import json
+import math
+import uuid
+import heapq
+import random
+from datetime import timedelta
+
+from analysis import Datetime_Epoch, \
+    HISTORY_COLUMN, \
+    TIMESTAMP_START
+
+
+# Synthetic fleet generator: writes node run files in the agent report format (RESULT), for testing and benchmarking
+# the analysis at fleet sizes beyond the sample data, e.g. DATA_FOLDER=data_synthetic python analysis_draw.py
+# Knobs:
+#   replicas    - the fleet size, node runs active at any time
+#   days        - the test duration, from TIMESTAMP_START
+#   churn       - node runs per replica per day; uptimes are exponential with mean 1/churn days
+#   gpu_mix     - {gpu_type: weight}, from GPU_TYPES
+#   country_mix - {country: weight}
+#   abnormal    - the fraction of node runs with one of the Get_AbnormalNodeRuns failures
+SYNTHETIC_FOLDER   = os.getenv("SYNTHETIC_FOLDER", "data_synthetic")
+SYNTHETIC_REPLICAS = int(os.getenv("SYNTHETIC_REPLICAS", 100))
+SYNTHETIC_DAYS     = float(os.getenv("SYNTHETIC_DAYS", 7))
+SYNTHETIC_CHURN    = float(os.getenv("SYNTHETIC_CHURN", 2))       # node runs per replica per day
+SYNTHETIC_ABNORMAL = float(os.getenv("SYNTHETIC_ABNORMAL", 0.05))
+SYNTHETIC_SEED     = int(os.getenv("SYNTHETIC_SEED", 0))
+
+# gpu_type: (weight, VRAM MiB, performance sol/s, power W, core clock MHz)
+GPU_TYPES = { "NVIDIA GeForce RTX 3060":       (20, 12288,  45, 130, 1850),
+              "NVIDIA GeForce RTX 3070":       (10,  8192,  60, 180, 1900),
+              "NVIDIA GeForce RTX 3080 Ti":    (10, 12288,  85, 260, 1800),
+              "NVIDIA GeForce RTX 4060 Ti":    (15,  8188,  50, 130, 2700),
+              "NVIDIA GeForce RTX 4070":       (10, 12282,  70, 180, 2700),
+              "NVIDIA GeForce RTX 4080 SUPER": (10, 16376, 130, 314, 2730),
+              "NVIDIA GeForce RTX 4090":       (15, 24564, 190, 400, 2650),
+              "NVIDIA GeForce RTX 5090":       (10, 32607, 230, 480, 2800) }
+GPU_MIX     = { gpu_type: x[0] for gpu_type, x in GPU_TYPES.items() }
+COUNTRY_MIX = { "United States": 40, "Canada": 8, "Germany": 10, "United Kingdom": 8, "France": 6, "Poland": 5,
+                "Brazil": 6, "Japan": 5, "Australia": 4, "none": 8 }
+CPU_TYPES   = [ ("AMD Ryzen 7 9800X3D 8-Core Processor", 16), ("AMD Ryzen 5 5600X 6-Core Processor", 12),
+                ("Intel(R) Core(TM) i7-12700K", 20), ("Intel(R) Core(TM) i5-10400F CPU @ 2.90GHz", 12) ]
+ABNORMAL_REASONS = [ 'Inconsistent Data', 'lolMiner Failures', 'No Mining Activity', 'Mining Stopped' ]
+LOG_EVENTS       = [ 'accepted', 'rejected', 'reconnects', 'errors' ]
+AGENT_COLUMNS    = [ 'agent_cpu_s', 'agent_children_cpu_s', 'agent_rss_MB', 'agent_threads', 'agent_tick_ms',
+                     'agent_report_bytes', 'agent_report_ms', 'agent_upload_bytes', 'agent_upload_ms' ]
+
+
+def Pick(rng, mix):
+    return rng.choices(list(mix), weights=list(mix.values()))[0]
+
+
+# A machine keeps its hardware and location across node runs
+def New_Machine(rng, gpu_mix, country_mix):
+    cpu_type, vcpus = rng.choice(CPU_TYPES)
+    return { 'salad_machine_id': str(uuid.UUID(int=rng.getrandbits(128))),
+             'gpu_type': Pick(rng, gpu_mix),
+             'country': Pick(rng, country_mix),
+             'cpu_type': cpu_type,
+             'cpu_num_vcpus': vcpus,
+             'cpu_ram_total_B': rng.choice([16, 32, 64]) * 1024**3,
+             'gpu_cuda_version': rng.choice([12.4, 12.8, 13.0]) }
+
+
+# The agent overhead values of a history row; a report (every 5 rows) is serialized and uploaded in the interval
+# before the next row, and grows with the history
+def Agent_Values(rng, no, rss):
+    reported = no > 0 and (no - 1) % 5 == 0
+    report_bytes = 2000 + 150 * no if reported else 0
+    return ",".join(str(x) for x in [ round(rng.uniform(0.2, 0.6) + (2.5 if no == 0 else 0), 3), round(rng.uniform(0.05, 0.2), 3),
+                                      round(rss + no * 0.001, 1), rng.randint(8, 12), round(rng.uniform(150, 600), 1),
+                                      report_bytes, round(report_bytes / 2e5 + rng.uniform(0.5, 2), 1) if reported else 0,
+                                      report_bytes, round(rng.uniform(100, 900), 1) if reported else 0 ])
+
+
+# One node run in the report format; reason is one of ABNORMAL_REASONS or None
+def New_NodeRun(rng, machine, online, rows, metric_interval, reason=None):
+    _, vram, sol, power, clock = GPU_TYPES[machine['gpu_type']]
+    sol, power = sol * rng.uniform(0.9, 1.05), power * rng.uniform(0.9, 1.05)
+    last_update = online + timedelta(seconds=(rows - 1) * metric_interval)
+    ram_used = rng.uniform(3, 12)
+    log_columns = ', '.join(f"log_{event}" for event in LOG_EVENTS)
+
+    history = []
+    accepted = rejected = 0
+    stopped_at = rows - rng.randint(12, 30) if reason == 'Mining Stopped' else rows
+    totals = dict.fromkeys(LOG_EVENTS, 0)
+    online_epoch = Datetime_Epoch(online)
+    rss = rng.uniform(60, 90)
+    for no in range(rows):
+        timestamp = (online + timedelta(seconds=no * metric_interval)).strftime('%Y-%m-%d %H:%M:%S')
+        if no == 0 or no >= stopped_at or reason == 'No Mining Activity':  # the miner is starting, or not hashing
+            row_sol, row_power, row_temp, row_clock, shares, rejects = 0, 0, 0, 0, 0, 0
+            gpu = f"{rng.randint(5, 8)},0,0,{rng.randint(30, 45)}"
+        else:
+            row_sol   = round(sol * rng.gauss(1, 0.01), 3)
+            row_power = round(power * rng.gauss(1, 0.005), 3)
+            row_temp  = rng.randint(60, 75)
+            row_clock = clock - 15 * rng.randint(0, 3)
+            shares    = rng.randint(0, max(1, round(sol * metric_interval / 1200)))  # about sol/20 shares a minute
+            rejects   = 1 if rng.random() < 0.01 else 0
+            gpu = f"28,90,100,{row_temp + rng.randint(-2, 2)}"
+        accepted += shares
+        rejected += rejects
+        events = [ shares, rejects, 1 if rng.random() < 0.001 else 0, 1 if rng.random() < 0.0005 else 0 ]
+        for event, count in zip(LOG_EVENTS, events):
+            totals[event] += count
+        history.append(f"{no},{timestamp},{gpu},{round(rng.uniform(0.5, 9), 1)},{round(ram_used, 1)},"
+                       f"{row_sol},{row_power},{row_temp},{row_clock},{accepted},{rejected}," + ",".join(map(str, events)) +
+                       f",{online_epoch + no * metric_interval},{Agent_Values(rng, no, rss)}")
+
+    node_run = { 'online': online.strftime('%Y-%m-%d %H:%M:%S'),
+                 'last_update': last_update.strftime('%Y-%m-%d %H:%M:%S'),
+                 'online_epoch': online_epoch,
+                 'last_update_epoch': Datetime_Epoch(last_update),
+                 'uptime_s': round((rows - 1) * metric_interval + rng.uniform(0, 1), 3),
+                 'no': rows - 1,
+                 'metric_interval_s': metric_interval,
+                 'report_number': 5,
+                 'miner_algorithm': "zelhash",
+                 'miner_state': "stopped" if reason == 'lolMiner Failures' else "running",
+                 'salad_machine_id': machine['salad_machine_id'],
+                 'pass': True,
+                 'gpu_cuda_version': machine['gpu_cuda_version'],
+                 'gpu_type': machine['gpu_type'],
+                 'gpu_number': 1,
+                 'gpu_vram_total_MiB': vram,
+                 'gpu_vram_used_MiB': round(vram * 0.06),
+                 'gpu_vram_used_percent_%': 6,
+                 'gpu_utilization_%': 0,
+                 'gpu_temperature_C': rng.randint(30, 45),
+                 'gpu_vram_utilization_%': 0,
+                 'cpu_type': machine['cpu_type'],
+                 'cpu_num_vcpus': machine['cpu_num_vcpus'],
+                 'cpu_freq_MHz': rng.randint(2900, 4800),
+                 'cpu_percent_%': round(rng.uniform(0.5, 5), 1),
+                 'cpu_ram_total_B': machine['cpu_ram_total_B'],
+                 'cpu_ram_used_B': round(machine['cpu_ram_total_B'] * ram_used / 100),
+                 'cpu_ram_used_%': round(ram_used, 1),
+                 'country': machine['country'],
+                 'location': "none" if machine['country'] == "none" else machine['country'],
+                 'rtt_ms': str(rng.randint(10, 500)),
+                 'upload_Mbps': str(rng.randint(10, 500)),
+                 'download_Mbps': str(rng.randint(50, 1000)),
+                 'rtt_to_us_west1_ms': f"{rng.uniform(10, 250):.2f}",
+                 'rtt_to_us_east2_ms': f"{rng.uniform(10, 250):.2f}",
+                 'rtt_to_eu_cent1_ms': f"{rng.uniform(10, 250):.2f}",
+                 'network_pass': True,
+                 'history_column': HISTORY_COLUMN + ', ' + log_columns + ', timestamp_epoch, ' + ', '.join(AGENT_COLUMNS),
+                 'miner_restarts': 0,
+                 'miner_downtime_s': 0,
+                 'miner_last_exit_code': None,
+                 'history_retention': "full",
+                 'miner_events': totals }
+
+    # The startup phases, in seconds since the process was created
+    phases, t = {}, rng.uniform(0.5, 3)
+    for phase, step in (('agent_start', 0), ('first_metric', rng.uniform(1, 4)), ('miner_spawn', rng.uniform(0.5, 2)),
+                        ('first_hash', rng.uniform(20, 90)), ('first_share', rng.uniform(5, 60))):
+        if phase == 'first_hash' and reason == 'No Mining Activity':
+            break
+        t += step
+        phases[phase] = round(t, 3)
+    phases['network_test_done'] = round(phases['agent_start'] + rng.uniform(30, 90), 3)
+    node_run['startup_phases_s'] = phases
+
+    if reason == 'Inconsistent Data':  # the last report was cut short
+        history = history[:-1]
+    node_run['history'] = history
+    return node_run
+
+
+# Write a synthetic fleet into folder; returns the number of node run files
+def Generate_Fleet(folder=SYNTHETIC_FOLDER, replicas=SYNTHETIC_REPLICAS, days=SYNTHETIC_DAYS, churn=SYNTHETIC_CHURN,
+                   gpu_mix=GPU_MIX, country_mix=COUNTRY_MIX, abnormal=SYNTHETIC_ABNORMAL, metric_interval=60, seed=SYNTHETIC_SEED):
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    machines = [ New_Machine(rng, gpu_mix, country_mix) for _ in range(max(1, replicas * 3)) ]  # machines come and go, and come back
+    end = TIMESTAMP_START + timedelta(days=days)
+    count = 0
+
+    # Allocate in online order across the replicas, each node run to a machine that is free by then: a machine runs
+    # one node run at a time, so its busy-until time is the last update of its node run
+    pending = [ (TIMESTAMP_START + timedelta(seconds=rng.uniform(30, 600)), replica) for replica in range(replicas) ]
+    heapq.heapify(pending)
+    free, busy = list(range(len(machines))), []  # machine indices; busy is a heap of (busy until, index)
+    written = set()
+    while pending and pending[0][0] < end:
+        online, replica = heapq.heappop(pending)
+        while busy and busy[0][0] <= online:
+            free.append(heapq.heappop(busy)[1])
+        if not free:  # every machine is busy, a new one joins
+            machines.append(New_Machine(rng, gpu_mix, country_mix))
+            free.append(len(machines) - 1)
+        k = rng.randrange(len(free))
+        free[k], free[-1] = free[-1], free[k]
+        machine = free.pop()
+
+        uptime = rng.expovariate(churn / 86400)
+        rows = max(2, min(math.floor(uptime / metric_interval), math.floor((end - online).total_seconds() / metric_interval)) + 1)
+        reason = rng.choice(ABNORMAL_REASONS) if rng.random() < abnormal else None
+        node_run = New_NodeRun(rng, machines[machine], online, rows, metric_interval, reason)
+        last_update = online + timedelta(seconds=(rows - 1) * metric_interval)
+        heapq.heappush(busy, (last_update, machine))
+
+        # Unique, as a machine never starts two node runs in the same second
+        file_name = node_run["online"].replace(":", "-").replace(" ", "_") + "_" + node_run["salad_machine_id"] + ".txt"
+        assert file_name not in written, f"duplicate node run file {file_name}"
+        written.add(file_name)
+        with open(os.path.join(folder, file_name), "w", encoding="utf-8") as f:
+            json.dump(node_run, f, indent=2)
+        count += 1
+        heapq.heappush(pending, (last_update + timedelta(seconds=rng.uniform(60, 900)), replica))  # the reallocation gap
+
+    print(f"----> Synthetic fleet: {count} node runs in {folder}")
+    return count
+
+
+if __name__ == "__main__":
+
+    Generate_Fleet()